@@ -11,12 +11,14 @@
 # Эти импорты нужны, что бы reload увидел модули
 from . import aov
 from . import uv_transform
+from . import packing
 from . import tex_size_finder
 from . import base_baker
 from . import common_baker
 
 from .aov import *
 from .uv_transform import *
+from .packing import *
 from .tex_size_finder import *
 from .base_baker import *
 from .common_baker import *
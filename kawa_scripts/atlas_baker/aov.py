@@ -22,7 +22,7 @@ class AOV:
 	If "AOV Output" exist, but have no inputs connected,
 	values of 'Color' or 'Value' input sockets will be used, same as in shaders.
 	"""
-	__slots__ = ('_name', '_type', '_default')
+	__slots__ = ('_name', '_type', '_default', '_default_rgb', '_default_rgba')
 	
 	def __init__(self, _name: 'str', _type: 'str', _default: 'float|tuple[float,float,float]' = 0):
 		self._name = _name
@@ -31,18 +31,22 @@ class AOV:
 			raise ValueError(f"Invalid type of AOV {_name!r}: {_type!r}")
 		
 		if isinstance(_default, (int, float)):
-			pass
+			default_rgb = (_default, _default, _default)
 		elif isinstance(_default, tuple):
 			if len(_default) != 3:
 				raise ValueError(f"Invalid length of default value of AOV {_name!r}: {len(_default)}, must be 3 (RGB).")
 			for i in range(3):
 				if not isinstance(_default[i], (int, float)):
 					raise ValueError(f"Invalid default[{i}] value of AOV {_name!r}: {type(_default[i])!r} {_default[i]!r}")
+			default_rgb = _default
 		else:
 			raise ValueError(f"Invalid default value of AOV {_name!r}: {type(_default)!r} {_default!r}")
 		
 		self._type = _type
 		self._default = _default
+		# AOV неизменяем, так что цветовые варианты значения по умолчанию считаются один раз
+		self._default_rgb = default_rgb
+		self._default_rgba = (*default_rgb, 1.0)
 	
 	@property
 	def name(self):
@@ -66,17 +70,11 @@ class AOV:
 	
 	@property
 	def default_rgb(self) -> 'tuple[float, float, float]':
-		if isinstance(self._default, (int, float)):
-			return self._default, self._default, self._default
-		if isinstance(self._default, tuple):
-			return self._default
+		return self._default_rgb
 	
 	@property
 	def default_rgba(self) -> 'tuple[float, float, float, float]':
-		if isinstance(self._default, (int, float)):
-			return self._default, self._default, self._default, 1.0
-		if isinstance(self._default, tuple):
-			return (*self._default, 1.0)
+		return self._default_rgba
 
 
 __all__ = ['AOV']
@@ -13,14 +13,12 @@ See `kawa_scripts.atlas_baker.BaseAtlasBaker`.
 """
 
 import gc
-import sys
-from random import shuffle
+from collections import defaultdict
+from math import sqrt
 from time import perf_counter
 
-import bmesh
 import bpy
-import mathutils
-from bmesh.types import BMesh, BMLayerItem
+import numpy as np
 from bpy.types import Object, Material, MaterialSlot, Image, Mesh, MeshUVLoop, MeshUVLoopLayer
 from bpy.types import ShaderNode, NodeSocket, NodeLink, NodeSocketFloat, NodeSocketColor, Node
 from mathutils import Vector
@@ -34,6 +32,7 @@ from .. import reporter
 from .. import shader_nodes
 from .. import uv
 
+from . import packing
 from .aov import AOV
 from .uv_transform import UVTransform
 
@@ -43,7 +42,18 @@ class BaseAtlasBaker:
 	Base class for Atlas Baking.
 	You must extend this class with required and necessary methods for your case,
 	configure variables and then run `bake_atlas`.
+	
+	Instance state is declared in `__slots__`. Subclasses without own `__slots__` still get `__dict__`
+	and can add any attributes they need.
 	"""
+	# Всё состояние в слотах: быстрее доступ к атрибутам и без __dict__ на экземпляре
+	__slots__ = (
+		'objects', 'target_size', 'padding', 'report_time',
+		'_materials', '_source_materials', '_matsizes', '_epsilon_cache', '_uv_name_cache', '_bake_types', '_aovs',
+		'_copies', '_copy_to_source', '_groups', '_islands', '_transforms',
+		'_transforms_origin', '_transforms_packed', '_transforms_affine', '_transforms_index',
+		'_bake_obj', '_node_editor_override', '_material_checked', '_material_outputs',
+	)
 	
 	ISLAND_TYPES = ('POLYGON', 'OBJECT')
 	"""
@@ -75,6 +85,19 @@ class BaseAtlasBaker:
 	
 	_PROC_NAME = "__AtlasBaker_Processing_"
 	
+	# Типы, которые запекаются через EMIT
+	_EMIT_BAKE_TYPES = frozenset(('EMIT', 'ALPHA', 'DIFFUSE', 'METALLIC', 'ROUGHNESS'))
+	
+	# Типы вычислительных устройств Cycles в порядке предпочтения
+	_CYCLES_DEVICE_TYPES = ('OPTIX', 'CUDA', 'HIP', 'METAL', 'ONEAPI')
+	
+	# Доля пустой площади после potpack, выше которой включается перепаковка через MaxRects
+	_PACK_WASTE_THRESHOLD = 0.35
+	# Во сколько раз увеличивается сторона атласа, если MaxRects не уложил все острова
+	_PACK_GROW_FACTOR = 1.05
+	# С какого числа трансформов материала их поиск идёт через сетку, см. _match_transforms_index
+	_MATCH_GRID_MIN_TRANSFORMS = 8
+	
 	def __init__(self):
 		self.objects = set()  # type: set[Object]
 		""" Mesh-Objects that will be atlassed. """
@@ -94,27 +117,41 @@ class BaseAtlasBaker:
 		# # # Внутренее # # #
 		
 		self._materials = dict()  # type: dict[tuple[Object, Material], Material]
+		# Исходные материалы из ключей ._materials, наполняется вместе с ним
+		self._source_materials = set()  # type: set[Material]
 		self._matsizes = dict()  # type: dict[Material, tuple[float, float]]
+		# Результаты get_epsilon и get_uv_name, что бы не дёргать их на каждую копию и каждый меш
+		self._epsilon_cache = dict()  # type: dict[tuple[Object, Material], float]
+		self._uv_name_cache = dict()  # type: dict[tuple[Object, Material], str|int]
 		self._bake_types = list()  # type: list[tuple[str, Image]]
 		self._aovs = dict()  # type: dict[str, AOV]
 		# Объекты, скопированные для операций по поиску UV развёрток
 		self._copies = set()  # type: set[Object]
+		# Исходные объекты копий из ._copies, что бы не искать их каждый раз заново
+		self._copy_to_source = dict()  # type: dict[Object, Object]
 		# Группы объектов по материалам из ._copies
-		self._groups = dict()  # type: dict[Material, set[Object]]
+		self._groups = defaultdict(set)  # type: dict[Material, set[Object]]
 		# Острова UV найденые на материалах из ._groups
 		self._islands = dict()  # type: dict[Material, uv.IslandsBuilder]
 		# Преобразования, необходимые для получения нового UV для атласса
-		self._transforms = dict()  # type: dict[Material, list[UVTransform]]
+		self._transforms = defaultdict(list)  # type: dict[Material, list[UVTransform]]
+		# Параллельно ._transforms: исходные боксы (T, 4) трансформов одним массивом на материал,
+		# для поиска трансформов без обхода объектов UVTransform
+		self._transforms_origin = dict()  # type: dict[Material, np.ndarray]
+		# Боксы (T, 4) трансформов для упаковки, до неё, в пространстве атласа
+		self._transforms_packed = dict()  # type: dict[Material, np.ndarray]
+		# Аффинные коэффициенты (T, 4) трансформов из ._transforms, заполняется при применении
+		self._transforms_affine = dict()  # type: dict[Material, np.ndarray]
+		# Индексы для поиска трансформов, см. _build_transforms_index, заполняется при применении
+		self._transforms_index = dict()  # type: dict[tuple[Material, float, float], tuple]
 		# Вспомогательный объект, необходимый для запекания атласа
 		self._bake_obj = None  # type: Object|None
 		self._node_editor_override = False
-		# Для _apply_baked_materials_bmesh
-		# Используем общий, что бы не пересоздовать его каждый раз
-		self._bmesh_loops_mem = set()  # type: set[int]
-		self._bmesh_loops_mem_hits = 0
-		# Для _find_islands_obj
-		# Используем общий, что бы не пересоздовать его каждый раз
-		self._find_islands_vectors = list()
+		# Материалы, уже прошедшие _check_material
+		self._material_checked = set()  # type: set[Material]
+		# Имена нод Material Output (CYCLES) исходных материалов, находятся в _check_material.
+		# Копии материалов для запекания имеют те же имена нод, так что поиск по дереву не повторяется.
+		self._material_outputs = dict()  # type: dict[Material, str]
 	
 	# # # Переопределяемые методы # # #
 	
@@ -168,6 +205,14 @@ class BaseAtlasBaker:
 		"""
 		return None
 	
+	def get_bake_margin(self, bake_type: str, target_image: 'Image') -> 'int':
+		"""
+		Should return bake margin in pixels for a given bake type and Image.
+		Margin fill runs per-pixel after the bake, so large values are costly;
+		by default it scales with Image width: 4px per 512px, but no less than 4px.
+		"""
+		return max(4, target_image.size[0] // 128)
+	
 	def before_bake(self, bake_type: str, target_image: 'Image'):
 		"""
 		This method is called before baking a given type and Image.
@@ -216,19 +261,33 @@ class BaseAtlasBaker:
 			raise RuntimeError(msg, mat, size) from exc
 	
 	def _get_epsilon_safe(self, obj: 'Object', mat: 'Material'):
-		epsilon = None
+		epsilon = self._epsilon_cache.get((obj, mat))
+		if epsilon is not None:
+			return epsilon
 		try:
 			epsilon = self.get_epsilon(obj, mat) or 1
+			self._epsilon_cache[(obj, mat)] = epsilon
 			return epsilon
 		except Exception as exc:
 			msg = f'Can not get epsilon for {obj!r} and {mat!r}.'
 			log.error(msg)
 			raise RuntimeError(msg, obj, mat, epsilon) from exc
 	
+	def _get_uv_name_safe(self, obj: 'Object', mat: 'Material') -> 'str|int':
+		uv_name = self._uv_name_cache.get((obj, mat))
+		if uv_name is not None:
+			return uv_name
+		try:
+			uv_name = self.get_uv_name(obj, mat) or 0
+			self._uv_name_cache[(obj, mat)] = uv_name
+			return uv_name
+		except Exception as exc:
+			log.raise_error(RuntimeError, f'Can not get UV name for {obj!r} and {mat!r}.', cause=exc)
+	
 	def _get_uv_data_safe(self, obj: 'Object', mat: 'Material', mesh: 'Mesh'):
 		uv_name = None
 		try:
-			uv_name = self.get_uv_name(obj, mat) or 0
+			uv_name = self._get_uv_name_safe(obj, mat)
 			uv_data = mesh.uv_layers[uv_name].data  # type: list[MeshUVLoop]
 		except Exception as exc:
 			log.raise_error(RuntimeError, f'Can not get uv_layers[{uv_name!r}] data for {obj!r} and {mat!r}.', cause=exc)
@@ -275,7 +334,8 @@ class BaseAtlasBaker:
 				tmat = self._get_target_material_safe(obj, slot.material)
 				if isinstance(tmat, bpy.types.Material):
 					self._materials[(obj, slot.material)] = tmat
-		mats = set(x[1] for x in self._materials.keys())
+					self._source_materials.add(slot.material)
+		mats = self._source_materials
 		log.info(f"Validating {len(mats)} source materials...")
 		if len(mats) < 1:
 			log.raise_error(RuntimeError, f"No source materials? {self._materials!r}")
@@ -285,7 +345,7 @@ class BaseAtlasBaker:
 	
 	def _prepare_matsizes(self):
 		mat_i = 0
-		smats = set(x[1] for x in self._materials.keys())
+		smats = self._source_materials
 		
 		if len(smats) < 1:
 			log.raise_error(RuntimeError, f"No source materials? {self._materials!r}")
@@ -323,16 +383,71 @@ class BaseAtlasBaker:
 		objects.deselect_all()
 	
 	def _separate_duplicates(self):
-		# Разбивает дупликаты по материалам
+		# Разбивает дупликаты по материалам.
+		# Без bpy.ops.mesh.separate: тот гоняет каждый объект через edit-mode и обновляет сцену,
+		# а копиям нужны только полигоны и UV-слои, их проще собрать напрямую из массивов.
 		log.info("Separating temp objects for atlasing...")
-		objects.deselect_all()
-		objects.activate(self._copies)
-		commons.ensure_op_finished(bpy.ops.mesh.separate(type='MATERIAL'), name='bpy.ops.mesh.separate')
 		count = len(self._copies)
-		self._copies.update(bpy.context.selected_objects)
-		objects.deselect_all()
+		for cobj in list(self._copies):
+			pieces = self._separate_copy(cobj)
+			if pieces is None:
+				continue
+			self._remove_copies({cobj})
+			self._copies.discard(cobj)
+			self._copies.update(pieces)
 		log.info(f"Separated {count} -> {len(self._copies)} temp objects")
 	
+	def _separate_copy(self, cobj: 'Object') -> 'list[Object]|None':
+		# Копии cobj по одной на каждый используемый слот, или None, если делить нечего.
+		# Каждый loop получает свою вершину, так меш куска не зависит от связности исходного.
+		slots = cobj.material_slots
+		if len(slots) < 2:
+			return None
+		mesh = meshes.get_safe(cobj)
+		poly_count, loop_count = len(mesh.polygons), len(mesh.loops)
+		mat_idx = np.empty(poly_count, dtype=np.int32)
+		loop_start = np.empty(poly_count, dtype=np.int32)
+		loop_total = np.empty(poly_count, dtype=np.int32)
+		vertex_index = np.empty(loop_count, dtype=np.int32)
+		co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+		mesh.polygons.foreach_get('material_index', mat_idx)
+		mesh.polygons.foreach_get('loop_start', loop_start)
+		mesh.polygons.foreach_get('loop_total', loop_total)
+		mesh.loops.foreach_get('vertex_index', vertex_index)
+		mesh.vertices.foreach_get('co', co)
+		loop_co = co.reshape(-1, 3)[vertex_index]
+		# Все слои в исходном порядке: get_uv_name может вернуть как имя, так и индекс
+		uv_layers = list()  # type: list[tuple[str, np.ndarray]]
+		for layer in mesh.uv_layers:  # type: MeshUVLoopLayer
+			uvs = np.empty(loop_count * 2, dtype=np.float32)
+			layer.data.foreach_get('uv', uvs)
+			uv_layers.append((layer.name, uvs.reshape(-1, 2)))
+		# Как и в Blender, индексы за пределами слотов относятся к последнему слоту
+		np.clip(mat_idx, 0, len(slots) - 1, out=mat_idx)
+		by_mat_order = np.argsort(mat_idx, kind='stable')
+		by_mat_bounds = np.searchsorted(mat_idx[by_mat_order], np.arange(len(slots) + 1))
+		pieces = list()  # type: list[Object]
+		for slot_idx in range(len(slots)):
+			faces = by_mat_order[by_mat_bounds[slot_idx]:by_mat_bounds[slot_idx + 1]]
+			if len(faces) < 1:
+				continue
+			totals = loop_total[faces]
+			offsets = np.cumsum(totals) - totals
+			loops = np.repeat(loop_start[faces] - offsets, totals) + np.arange(offsets[-1] + totals[-1])
+			piece_mesh = bpy.data.meshes.new(mesh.name)  # type: Mesh
+			polygons = [range(offset, offset + total) for offset, total in zip(offsets.tolist(), totals.tolist())]
+			piece_mesh.from_pydata(loop_co[loops].tolist(), [], polygons)
+			for uv_name, uvs in uv_layers:
+				piece_mesh.uv_layers.new(name=uv_name).data.foreach_set('uv', uvs[loops].ravel())
+			piece_mesh.materials.append(slots[slot_idx].material)
+			piece_mesh.update()
+			piece = bpy.data.objects.new(cobj.name, piece_mesh)
+			piece[self._PROP_ORIGIN_OBJECT] = cobj[self._PROP_ORIGIN_OBJECT]
+			for collection in cobj.users_collection:
+				collection.objects.link(piece)
+			pieces.append(piece)
+		return pieces
+	
 	def _get_single_material(self, obj: 'Object') -> 'Material':
 		ms_c = len(obj.material_slots)
 		if ms_c != 1:  # TODO
@@ -343,9 +458,11 @@ class BaseAtlasBaker:
 			raise RuntimeError("mat is None", obj)
 		return mat
 	
-	def _cleanup_duplicates(self):
-		# Удаляет те материалы, которые не будут атлассироваться
-		source_materials = list(x[1] for x in self._materials.keys())
+	def _map_duplicates(self):
+		# Один проход по копиям: находит исходные объекты и материалы,
+		# сразу отбрасывает те материалы, которые не будут атлассироваться,
+		# и группирует остальные копии по материалам в self._groups
+		self._copy_to_source.clear()
 		to_delete = set()
 		for cobj in self._copies:
 			sobj = self._get_source_object(cobj)
@@ -353,30 +470,31 @@ class BaseAtlasBaker:
 			tmat = self._materials.get((sobj, smat))
 			if tmat is None or tmat is False:
 				to_delete.add(cobj)
+				continue
+			self._copy_to_source[cobj] = sobj
+			self._groups[smat].add(cobj)
+		self._cleanup_duplicates(to_delete)
+		log.info(f"Grouped {len(self._copies)} temp objects into {len(self._groups)} material groups.")
+	
+	@staticmethod
+	def _remove_copies(copies: 'set[Object]'):
+		# Удаление напрямую через bpy.data, без оператора, выделения и обновления сцены на каждый объект.
+		# batch_remove пересобирает связи данных один раз на пачку, а не на каждый объект.
+		# Меши копий принадлежат только копиям, так что удаляются вместе с ними.
+		copy_meshes = set(cobj.data for cobj in copies if isinstance(cobj.data, bpy.types.Mesh))
+		bpy.data.batch_remove(ids=copies)
+		copy_meshes = [mesh for mesh in copy_meshes if mesh.users == 0]
+		if len(copy_meshes) > 0:
+			bpy.data.batch_remove(ids=copy_meshes)
+	
+	def _cleanup_duplicates(self, to_delete: 'set[Object]'):
+		# Удаляет копии с теми материалами, которые не будут атлассироваться
 		if len(to_delete) < 1:
 			return
-		objects.deselect_all()
-		for cobj in to_delete:
-			cobj.hide_set(False)
-			cobj.select_set(True)
-		commons.ensure_op_finished(bpy.ops.object.delete(use_global=True, confirm=True), name='bpy.ops.object.delete')
-		if len(bpy.context.selected_objects) > 0:  # TODO
-			raise RuntimeError("len(bpy.context.selected_objects) > 0", list(bpy.context.selected_objects))
-		for cobj in to_delete:
-			self._copies.discard(cobj)
+		self._remove_copies(to_delete)
+		self._copies.difference_update(to_delete)
 		log.info(f"Removed {len(to_delete)} temp objects, left {len(self._copies)} objects.")
 	
-	def _group_duplicates(self):
-		# Группирует self._copies по материалам в self._groups
-		for obj in self._copies:
-			mat = self._get_single_material(obj)
-			group = self._groups.get(mat)
-			if group is None:
-				group = set()
-				self._groups[mat] = group
-			group.add(obj)
-		log.info(f"Grouped {len(self._copies)} temp objects into {len(self._groups)} material groups.")
-	
 	def _find_islands(self):
 		mat_i, obj_i = 0, 0
 		
@@ -391,24 +509,25 @@ class BaseAtlasBaker:
 		lr = reporter.LambdaReporter(report_time=self.report_time, func=do_report)
 		log.info("Searching islands...")
 		# Поиск островов, наполнение self._islands
-		for mat, group in self._groups.items():
+		# Порядок self._islands задаёт порядок упаковки, а значит и сам атлас,
+		# а self._groups наполняется обходом множества копий,
+		# так что материалы обходятся по одному, отсортированными по имени.
+		for mat, group in sorted(self._groups.items(), key=lambda kv: kv[0].name):
 			# log.info("Searching islands of material %s in %d objects...", mat.name, len(group))
 			mat_size = self._matsizes.get(mat)
 			builder = commons.dict_get_or_add(self._islands, mat, uv.IslandsBuilder)
-			for obj in group:
-				bm, mesh = None, None
+			# Размер текстуры один на материал
+			scale = np.array(mat_size, dtype=np.float32)
+			# Порядок объектов влияет на слияние островов, а group - множество,
+			# так что объекты сортируются по имени, что бы атлас получался одинаковым от запуска к запуску.
+			for obj in sorted(group, key=lambda o: o.name):
 				try:
-					mesh = meshes.get_safe(obj)
-					bm = bmesh.new()
-					bm.from_mesh(mesh)
-					self._find_islands_obj(obj, mesh, bm, mat, builder, mat_size)
+					mode, epsilon, uvs, loop_start, loop_total = self._read_islands_obj(obj, mat)
+					self._find_islands_obj(mode, epsilon, uvs, loop_start, loop_total, builder, scale)
 					obj_i += 1
 				except Exception as exc:
-					msg = f"Can not find islands on {obj!r}: {mesh!r}, {bm!r}, {mat!r}, {builder!r}: {mat_size!r}"
+					msg = f"Can not find islands on {obj!r}: {mat!r}, {builder!r}: {mat_size!r}"
 					log.raise_error(RuntimeError, msg, cause=exc)
-				finally:
-					if bm is not None:
-						bm.free()
 				lr.ask_report(False)
 			mat_i += 1
 			lr.ask_report(False)
@@ -418,162 +537,197 @@ class BaseAtlasBaker:
 		# 	log.info("\tMaterial %s have %d islands:", mat, len(builder.bboxes))
 		# 	for bbox in builder.bboxes:
 		# 		log.info("\t\t%s", str(bbox))
-		# В процессе работы с остравами мы могли настрать много мусора,
-		# можно явно от него избавиться
-		gc.collect()
+		# Мусор от поиска островов освобождается счётчиком ссылок по мере работы,
+		# циклов в нём нет, так что полная сборка здесь не нужна.
 		pass
 	
-	def _find_islands_obj(self, obj: 'Object', mesh: 'Mesh', bm: 'BMesh', mat: 'Material', builder: '_uv.IslandsBuilder',
-			mat_size: 'tuple[float,float]'):
-		mat_size_x, mat_size_y = mat_size
-		origin = self._get_source_object(obj)
+	def _read_islands_obj(self, obj: 'Object', mat: 'Material') -> 'tuple':
+		# Всё, что требует bpy, для поиска островов на obj: режим, epsilon и массивы меша.
+		mesh = meshes.get_safe(obj)
+		origin = self._copy_to_source[obj]
 		epsilon = self._get_epsilon_safe(origin, mat)
-		
-		uv_name = self.get_uv_name(origin, mat) or 0
-		bm_uv_layer = bm.loops.layers.uv[uv_name]  # type: BMLayerItem
-		
-		bm.faces.ensure_lookup_table()
-		faces = list(bm_face.index for bm_face in bm.faces)  # type: list[int]
-		# Оптимизация. Сортировка от большей площади к меньшей,
-		# что бы сразу сделать большие боксы и реже пере-расширять их.
-		faces.sort(key=lambda index: uv.uv_area_bmesh(bm.faces[index], bm_uv_layer), reverse=True)
-		
+		uv_name = self._get_uv_name_safe(origin, mat)
 		mode = self.get_island_mode(origin, mat)
+		if mode not in self.ISLAND_TYPES:
+			raise RuntimeError('Invalid mode', mode)
+		poly_count = len(mesh.polygons)
+		loop_start = np.empty(poly_count, dtype=np.int32)
+		loop_total = np.empty(poly_count, dtype=np.int32)
+		mesh.polygons.foreach_get('loop_start', loop_start)
+		mesh.polygons.foreach_get('loop_total', loop_total)
+		uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+		mesh.uv_layers[uv_name].data.foreach_get('uv', uvs)
+		return mode, epsilon, uvs.reshape(-1, 2), loop_start, loop_total
+	
+	def _find_islands_obj(self, mode: 'str', epsilon: 'float', uvs: 'np.ndarray', loop_start: 'np.ndarray',
+			loop_total: 'np.ndarray', builder: 'uv.IslandsBuilder', scale: 'np.ndarray'):
+		# Преобразование в размеры текстуры, сразу для всего слоя
+		uvs *= scale
+		# Оба режима - это набор кусков uvs, каждый кусок формирует свой bbox:
+		# OBJECT - один кусок на весь меш, POLYGON - по куску на полигон.
 		if mode == 'OBJECT':
-			# Режим одного острова: все точки всех полигонов формируют общий bbox
-			self._find_islands_vectors.clear()
-			for bm_face_index in faces:
-				bm_face = bm.faces[bm_face_index]
-				for bm_loop in bm_face.loops:
-					vec2 = bm_loop[bm_uv_layer].uv.copy()
-					# Преобразование в размеры текстуры
-					vec2.x *= mat_size_x
-					vec2.y *= mat_size_y
-					self._find_islands_vectors.append(vec2)
-			builder.add_seq(self._find_islands_vectors, epsilon=epsilon)
+			starts = np.zeros(1, dtype=np.int32)
+			totals = np.full(1, len(uvs), dtype=np.int32)
 		elif mode == 'POLYGON':
-			# Режим многих островов: каждый полигон формируют свой bbox
-			try:
-				for bm_face_index in faces:
-					bm_face = bm.faces[bm_face_index]
-					self._find_islands_vectors.clear()
-					for bm_loop in bm_face.loops:
-						vec2 = bm_loop[bm_uv_layer].uv.copy()  # type: Vector
-						# Преобразование в размеры текстуры
-						vec2.x *= mat_size_x
-						vec2.y *= mat_size_y
-						self._find_islands_vectors.append(vec2)
-					builder.add_seq(self._find_islands_vectors, epsilon=epsilon)
-			except Exception as exc:
-				raise RuntimeError("Error searching multiple islands!", bm_uv_layer, obj, mat, mesh, builder) from exc
+			# Оптимизация. Сортировка от большей площади к меньшей,
+			# что бы сразу сделать большие боксы и реже пере-расширять их.
+			faces = np.argsort(-uv.uv_areas_array(uvs, loop_start, loop_total), kind='stable')
+			starts, totals = loop_start[faces], loop_total[faces]
 		else:
 			raise RuntimeError('Invalid mode', mode)
+		nonempty = totals > 0
+		if not nonempty.all():
+			log.warning(f"_find_islands_obj: {int(np.count_nonzero(~nonempty))} empty pieces!")
+			starts, totals = starts[nonempty], totals[nonempty]
+		if len(totals) < 1:
+			return
+		# Границы всех кусков сразу: куски собираются подряд и сворачиваются через reduceat
+		offsets = np.cumsum(totals) - totals
+		points = uvs[np.repeat(starts - offsets, totals) + np.arange(offsets[-1] + totals[-1])]
+		mins = np.minimum.reduceat(points, offsets, axis=0)
+		maxs = np.maximum.reduceat(points, offsets, axis=0)
+		try:
+			self._add_islands(builder, mins, maxs, totals, epsilon)
+		except Exception as exc:
+			raise RuntimeError("Error searching islands!", mode, builder) from exc
+	
+	@staticmethod
+	def _add_islands(builder: 'uv.IslandsBuilder', mins: 'np.ndarray', maxs: 'np.ndarray', totals: 'np.ndarray', epsilon: 'float'):
+		# Аналог builder.add_seq для каждого куска, но bbox'ы уже посчитаны по массивам точек
+		add_bbox, Island = builder.add_bbox, uv.Island
+		for mn, mx, total in zip(mins.tolist(), maxs.tolist(), totals.tolist()):
+			island = Island(Vector(mn), Vector(mx))
+			island.extends = total
+			add_bbox(island, epsilon=epsilon)
 	
 	def _delete_groups(self):
 		count = len(self._copies)
 		log.info(f"Removing {count} temp objects...")
-		objects.deselect_all()
-		for obj in self._copies:
-			obj.hide_set(False)
-			obj.select_set(True)
-		commons.ensure_op_finished(bpy.ops.object.delete(use_global=True, confirm=True), name='bpy.ops.object.delete')
-		if len(bpy.context.selected_objects) > 0:  # TODO
-			raise RuntimeError("len(bpy.context.selected_objects) > 0", list(bpy.context.selected_objects))
+		self._remove_copies(self._copies)
+		self._copies.clear()
+		self._copy_to_source.clear()
+		self._groups.clear()
 		log.info(f"Removed {count} temp objects.")
 	
 	def _create_transforms_from_islands(self):
-		# Преобразует острава в боксы в формате mathutils.geometry.box_pack_2d
+		# Преобразует острава в боксы для упаковки
+		# Обратные размеры атласа постоянны, размеры материала - на материал,
+		# так что все координаты считаются умножением массивов разом на весь материал.
+		inv_target = 1.0 / np.array(self.target_size * 2, dtype=np.float64)
+		pad = np.array((-self.padding, -self.padding, 2 * self.padding, 2 * self.padding), dtype=np.float64)
 		for mat, builder in self._islands.items():
+			if len(builder.bboxes) < 1:
+				continue
+			# Боксы читаются одним проходом, проверка валидности - там же, а не отдельным обходом
+			corners = list()  # type: list[tuple[float, float, float, float]]
 			for bbox in builder.bboxes:
-				if not bbox.is_valid():
-					raise ValueError("box is invalid: ", bbox, mat, builder, builder.bboxes)
-				origin_w, origin_h = self._matsizes[mat]
+				mn, mx = bbox.mn, bbox.mx
+				if mn is None or mx is None:
+					raise ValueError("box is invalid: ", bbox, mat, builder)
+				corners.append((mn.x, mn.y, mx.x, mx.y))
+			rects = np.array(corners, dtype=np.float64)
+			inv_origin = 1.0 / np.array(self._matsizes[mat] * 2, dtype=np.float64)
+			# две точки -> одна точка + размер
+			rects[:, 2:] -= rects[:, :2]
+			# добавляем отступы
+			padded = rects + pad
+			origin_norm = rects * inv_origin
+			padded_norm = padded * inv_origin
+			# Координаты для упаковки
+			# Т.к. упаковщики пакуют в квадрат, а у нас может быть текстура любой формы,
+			# то необходимо скорректировать пропорции
+			packed_norm = padded * inv_target
+			transforms = self._transforms[mat]
+			self._transforms_origin[mat] = origin_norm
+			# packed_norm всё равно перезаписывается после упаковки, так что до неё живёт только в массиве
+			self._transforms_packed[mat] = packed_norm
+			for origin, padded in zip(origin_norm.tolist(), padded_norm.tolist()):
 				t = UVTransform()
 				t.material = mat
-				# две точки -> одна точка + размер
-				x, w = bbox.mn.x, (bbox.mx.x - bbox.mn.x)
-				y, h = bbox.mn.y, (bbox.mx.y - bbox.mn.y)
-				# t.origin_tex = (x, y, w, h)
-				t.origin_norm = Vector((x / origin_w, y / origin_h, w / origin_w, h / origin_h))
-				# добавляем отступы
-				xp, yp = x - self.padding, y - self.padding,
-				wp, hp = w + 2 * self.padding, h + 2 * self.padding
-				# meta.padded_tex = (xp, yp, wp, hp)
-				t.padded_norm = Vector((xp / origin_w, yp / origin_h, wp / origin_w, hp / origin_h))
-				# Координаты для упаковки
-				# Т.к. box_pack_2d пытается запаковать в квадрат, а у нас может быть текстура любой формы,
-				# то необходимо скорректировать пропорции
-				xb, yb = xp / self.target_size[0], yp / self.target_size[1]
-				wb, hb = wp / self.target_size[0], hp / self.target_size[1]
-				t.packed_norm = Vector((xb, yb, wb, hb))
-				metas = commons.dict_get_or_add(self._transforms, mat, list)
-				metas.append(t)
+				t.origin_norm = Vector(origin)
+				t.padded_norm = Vector(padded)
+				transforms.append(t)
 	
 	def _pack_islands(self):
-		# Несколько итераций перепаковки
-		# TODO вернуть систему с раундами
-		boxes = list()  # type: list[list[float|UVTransform]]
-		for metas in self._transforms.values():
-			for meta in metas:
-				boxes.append([*meta.packed_norm, meta])
+		# Числа боксов хранятся в одном массиве (N, 4), трансформы - в параллельном списке.
+		# Упаковщикам отдаются списки [x, y, w, h, индекс], Vector создаются один раз в самом конце.
+		transforms = [meta for metas in self._transforms.values() for meta in metas]
+		rects = np.concatenate([self._transforms_packed[mat] for mat in self._transforms.keys()] or [np.empty((0, 4))])
+		boxes = [[*rect, k] for k, rect in enumerate(rects.tolist())]  # type: list[list[float|int]]
 		log.info(f"Packing {len(boxes)} islands...")
-		best = sys.maxsize
-		rounds = 15  # TODO
-		while rounds > 0:
-			rounds -= 1
-			# Т.к. box_pack_2d псевдослучайный и может давать несколько результатов,
-			# то итеративно отбираем лучшие
-			shuffle(boxes)
-			pack_x, pack_y = mathutils.geometry.box_pack_2d(boxes)
-			score = max(pack_x, pack_y)
-			log.info(f"Packing round: {rounds}, score: {score}...")
-			if score >= best:
-				continue
-			for box in boxes:
-				box[4].packed_norm = Vector(tuple(box[i] / score for i in range(4)))
-			best = score
-		if best == sys.maxsize:
-			raise AssertionError()
+		# Быстрый путь: однопроходная упаковка полками. Если потери площади приемлемы, то на этом всё.
+		area = float(np.sum(rects[:, 2] * rects[:, 3]))
+		pack_x, pack_y = packing.potpack(boxes)
+		best = max(pack_x, pack_y)
+		self._read_packed_boxes(boxes, rects)
+		waste = 1.0 - area / (best * best) if best > 0 else 0.0
+		log.info(f"Packed by potpack, score: {best}, waste: {waste:.3f}...")
+		if waste > self._PACK_WASTE_THRESHOLD:
+			best = self._pack_islands_maxrects(boxes, rects, area, best)
+		if best > 0:
+			rects /= best
+		for meta, rect in zip(transforms, rects.tolist()):
+			meta.packed_norm = Vector(rect)
+			meta.finalize()
+	
+	def _pack_islands_maxrects(self, boxes: 'list[list[float|int]]', rects: 'np.ndarray', area: 'float', best: 'float') -> 'float':
+		# Медленный путь: MaxRects в квадрат, начиная с площади островов, с ростом стороны при неудаче.
+		# Принимается только результат лучше best, он записывается в rects.
+		# Большие острова идут первыми, так MaxRects оставляет меньше дыр.
+		boxes.sort(key=lambda b: (-max(b[2], b[3]), -b[2] * b[3]))
+		max_side = max(max(b[2], b[3]) for b in boxes)
+		side = max(sqrt(area), max_side)
+		while side < best:
+			fits = packing.maxrects(boxes, side, side)
+			log.info(f"Packing by maxrects into {side}: {'fits' if fits else 'overflow'}...")
+			if fits:
+				self._read_packed_boxes(boxes, rects)
+				return max(max(b[0] + b[2], b[1] + b[3]) for b in boxes)
+			side *= self._PACK_GROW_FACTOR
+		return best
+	
+	@staticmethod
+	def _read_packed_boxes(boxes: 'list[list[float|int]]', rects: 'np.ndarray'):
+		# Упаковщики меняют только x, y
+		for box in boxes:
+			rect = rects[box[4]]
+			rect[0], rect[1] = box[0], box[1]
 	
 	def _prepare_bake_obj(self):
 		objects.deselect_all()
+		# Полигоны идут в порядке трансформов, по 4 своих вершины и loop'а на каждый,
+		# углы каждого - в порядке UVTransform.iterate_corners
+		transforms = [t for ts in self._transforms.values() for t in ts]
+		poly_count = len(transforms)
+		# (T, 4, 2, 2): трансформ, угол, оригинальная/атласная UV, x/y
+		corners = np.array([
+			[(uv_original, uv_atlas) for _, uv_original, uv_atlas in t.iterate_corners()] for t in transforms
+		], dtype=np.float32).reshape(poly_count, 4, 2, 2)
+		corners_packed = corners[:, :, 1]
+		verts_co = np.empty((poly_count, 4, 3), dtype=np.float32)
+		verts_co[:, :, :2] = corners_packed
+		verts_co[:, :, 2] = (np.arange(poly_count, dtype=np.float32) / max(poly_count, 1))[:, None]
+		# Меш строится сразу целиком, без BMesh: вершины loop'а совпадают с его индексом
 		mesh = bpy.data.meshes.new("__Kawa_Bake_UV_Mesh")  # type: Mesh
-		# Создаем столько полигонов, сколько трансформов
-		bm = bmesh.new()
-		try:
-			for transforms in self._transforms.values():
-				for _ in range(len(transforms)):
-					v0, v1, v2, v3 = bm.verts.new(), bm.verts.new(), bm.verts.new(), bm.verts.new()
-					bm.faces.new((v0, v1, v2, v3))
-				bm.to_mesh(mesh)
-		finally:
-			bm.free()
+		mesh.from_pydata(verts_co.reshape(-1, 3).tolist(), [], np.arange(poly_count * 4).reshape(-1, 4).tolist())
+		if len(mesh.polygons) != poly_count or len(mesh.loops) != poly_count * 4:
+			raise AssertionError("Bake mesh does not match transforms", mesh, poly_count, len(mesh.polygons), len(mesh.loops))
 		# Создаем слои для преобразований
-		mesh.uv_layers.new(name=self._UV_ORIGINAL)
-		mesh.uv_layers.new(name=self._UV_ATLAS)
+		uvl_original = mesh.uv_layers.new(name=self._UV_ORIGINAL)  # type: MeshUVLoopLayer
+		uvl_atlas = mesh.uv_layers.new(name=self._UV_ATLAS)  # type: MeshUVLoopLayer
 		mesh.materials.clear()
 		for mat in self._transforms.keys():
 			mesh.materials.append(mat)
-		mat2idx = {m: i for i, m in enumerate(mesh.materials)}
-		# Прописываем в полигоны координаты и материалы
-		uvl_original = mesh.uv_layers[self._UV_ORIGINAL]  # type: MeshUVLoopLayer
-		uvl_atlas = mesh.uv_layers[self._UV_ATLAS]  # type: MeshUVLoopLayer
-		uvd_original, uvd_atlas = uvl_original.data, uvl_atlas.data
-		poly_idx = 0
-		for mat, transforms in self._transforms.items():
-			for t in transforms:
-				poly = mesh.polygons[poly_idx]
-				if len(poly.loop_indices) != 4:
-					raise AssertionError("len(poly.loop_indices) != 4", mesh, poly_idx, poly, len(poly.loop_indices))
-				if len(poly.vertices) != 4:
-					raise AssertionError("len(poly.vertices) != 4", mesh, poly_idx, poly, len(poly.vertices))
-				for vert_idx, uv_a, uv_b in t.iterate_corners():
-					mesh.vertices[poly.vertices[vert_idx]].co.xy = uv_b
-					mesh.vertices[poly.vertices[vert_idx]].co.z = poly_idx * 1.0 / len(mesh.polygons)
-					uvd_original[poly.loop_indices[vert_idx]].uv = uv_a
-					uvd_atlas[poly.loop_indices[vert_idx]].uv = uv_b
-				poly.material_index = mat2idx[mat]
-				poly_idx += 1
+		# Прописываем в полигоны координаты и материалы за раз через foreach_set,
+		# это намного быстрее, чем писать каждую координату через RNA.
+		uvl_original.data.foreach_set('uv', corners[:, :, 0].ravel())
+		uvl_atlas.data.foreach_set('uv', corners_packed.ravel())
+		mat_idx = np.repeat(
+			np.arange(len(self._transforms), dtype=np.int32),
+			[len(ts) for ts in self._transforms.values()],
+		)
+		mesh.polygons.foreach_set('material_index', mat_idx)
+		mesh.update()
 		
 		# Вставляем меш на сцену и активируем
 		objects.deselect_all()
@@ -609,6 +763,8 @@ class BaseAtlasBaker:
 			log.raise_error(RuntimeError, f'after_bake failed! {bake_type} {target_image}', cause=exc)
 	
 	def _check_material(self, mat: 'Material'):
+		if mat in self._material_checked:
+			return
 		node_tree, out, surface, src_shader_s, src_shader = None, None, None, None, None
 		try:
 			node_tree = mat.node_tree
@@ -622,14 +778,20 @@ class BaseAtlasBaker:
 			if src_shader is None:
 				# TODO deeper check
 				raise RuntimeError(f"No main shader found in material {mat.name!r}")
+			cycles_link = shader_nodes.get_link_surface(mat, target='CYCLES')
+			if cycles_link is not None:
+				self._material_outputs[mat] = cycles_link.to_node.name
 			
-			for aov_name, aov in self._aovs.items():
-				aov_socket = shader_nodes.get_socket_aov(mat, aov_name, aov.type)
+			# Все AOV проверяются за один проход по нодам материала
+			aov_types = {aov_name: aov.type for aov_name, aov in self._aovs.items()}
+			if len(aov_types) > 0:
+				aov_sockets = shader_nodes.get_sockets_aov(mat, aov_types)
 				# TODO deeper check
 				pass
 		
 		except Exception as exc:
 			log.raise_error(RuntimeError, f"Material {mat.name!r} is invalid!", cause=exc)
+		self._material_checked.add(mat)
 	
 	def _get_node_editor_override(self):
 		if self._node_editor_override is not False:
@@ -686,11 +848,21 @@ class BaseAtlasBaker:
 		except Exception as exc:
 			raise RuntimeError('_ungroup_nodes_for_bake', mat, override, count, mat.node_tree.nodes.active) from exc
 	
-	def _edit_mat_replace_shader(self, mat: 'Material'):
+	def _get_link_surface_for_bake(self, mat: 'Material', source_mat: 'Material|None' = None) -> 'NodeLink|None':
+		# То же, что shader_nodes.get_link_surface(mat, target='CYCLES'),
+		# но для копии известного материала нода выхода берётся сразу по имени.
+		output_name = self._material_outputs.get(source_mat) if source_mat is not None else None
+		if output_name is not None:
+			output = mat.node_tree.nodes.get(output_name)
+			if output is not None and output.inputs['Surface'].is_linked:
+				return output.inputs['Surface'].links[0]
+		return shader_nodes.get_link_surface(mat, target='CYCLES')
+	
+	def _edit_mat_replace_shader(self, mat: 'Material', source_mat: 'Material|None' = None):
 		# Замещает оригинальный шейдер на Emission
 		# Возвращает: оригинальный шейдер, новый шейдер, сокет нового шейдера, в который подрубать выводы для рендера
 		
-		link_surface = shader_nodes.get_link_surface(mat, target='CYCLES')
+		link_surface = self._get_link_surface_for_bake(mat, source_mat)
 		src_shader = link_surface.from_node
 		
 		bake_shader = mat.node_tree.nodes.new('ShaderNodeEmission')  # type: ShaderNode|Node
@@ -703,69 +875,68 @@ class BaseAtlasBaker:
 		
 		return src_shader, bake_shader, bake_color
 	
-	def _edit_mat_for_aov(self, mat: 'Material', aov: 'AOV|None'):
-		_, bake_shader, bake_color = self._edit_mat_replace_shader(mat)
+	def _edit_mat_for_aov(self, mat: 'Material', aov: 'AOV|None', source_mat: 'Material|None' = None):
+		_, bake_shader, bake_color = self._edit_mat_replace_shader(mat, source_mat)
 		aov_socket = shader_nodes.get_socket_aov(mat, aov.name, aov.type)
 		
 		if aov_socket is None:
 			# Если AOV сокет не найден, то просто создаем новую ноду с нужными дэфолтами.
-			bake_color.default_value[:] = aov.default_rgba
+			bake_color.default_value = aov.default_rgba
 			return
 		
 		if aov_socket.is_linked:
 			# Если AOV сокет есть, то нужно проверить подключение
 			mat.node_tree.links.new(aov_socket.links[0].from_socket, bake_color)
 		elif aov.is_value:
-			for i in range(3):
-				bake_color.default_value[i] = float(aov_socket.default_value)
-			bake_color.default_value[3] = 1.0
+			shader_nodes.socket_set_gray(bake_color, float(aov_socket.default_value))
 		elif aov.is_color:
-			bake_color.default_value = aov_socket.default_value
-			bake_color.default_value[3] = 1.0
+			bake_color.default_value = (*aov_socket.default_value[:3], 1.0)
 	
-	def _edit_mat_for_bake(self, mat: 'Material', bake_type: 'str'):
+	def _edit_mat_for_bake(self, mat: 'Material', bake_type: 'str', source_mat: 'Material|None' = None):
 		# Подключает alpha-emission шейдер на выход материала
 		# Если не найден выход, DEFAULT или ALPHA, срёт ошибками
 		# Здесь нет проверок на ошибки
 		node_tree = mat.node_tree
 		nodes = node_tree.nodes
+		# Связи дерева обходятся один раз, а не на каждый копируемый сокет
+		links_map = shader_nodes.links_by_to_socket(node_tree)
 		
 		if bake_type == 'ALPHA':
-			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat)
+			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat, source_mat)
 			src_alpha = src_shader.inputs.get('Alpha')
 			if src_alpha is not None:
-				shader_nodes.socket_copy_input(src_alpha, bake_color)
+				shader_nodes.socket_copy_input(src_alpha, bake_color, links_map=links_map)
 			else:
 				# По умолчанию непрозрачность
-				bake_color.default_value[:] = (1, 1, 1, 1.0)
+				shader_nodes.socket_set_gray(bake_color, 1)
 		elif bake_type == 'DIFFUSE':
-			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat)
+			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat, source_mat)
 			src_shader_color = src_shader.inputs.get('Base Color') or src_shader.inputs.get('Color')  # type: NodeSocket
 			if src_shader_color is not None:
-				shader_nodes.socket_copy_input(src_shader_color, bake_color)
+				shader_nodes.socket_copy_input(src_shader_color, bake_color, links_map=links_map)
 			else:
 				# По умолчанию 75% отражаемости
-				bake_color.default_value[:] = (0.75, 0.75, 0.75, 1.0)
+				shader_nodes.socket_set_gray(bake_color, 0.75)
 		elif bake_type == 'METALLIC':
-			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat)
+			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat, source_mat)
 			src_metallic = src_shader.inputs.get('Metallic')  # or src_shader.inputs.get('Specular')  # type: NodeSocket
 			if src_metallic is not None:  # TODO RGB <-> value
-				shader_nodes.socket_copy_input(src_metallic, bake_color)
+				shader_nodes.socket_copy_input(src_metallic, bake_color, links_map=links_map)
 			else:
 				# По умолчанию 10% металличности
-				bake_color.default_value[:] = (0.1, 0.1, 0.1, 1.0)
+				shader_nodes.socket_set_gray(bake_color, 0.1)
 		elif bake_type == 'ROUGHNESS':
-			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat)
+			src_shader, bake_shader, bake_color = self._edit_mat_replace_shader(mat, source_mat)
 			src_roughness = src_shader.inputs.get('Roughness')  # type: NodeSocket
 			if src_roughness is not None:  # TODO RGB <-> value
-				shader_nodes.socket_copy_input(src_roughness, bake_color)
+				shader_nodes.socket_copy_input(src_roughness, bake_color, links_map=links_map)
 			else:
 				# По умолчанию 90% шершавости
-				bake_color.default_value[:] = (0.9, 0.9, 0.9, 1.0)
+				shader_nodes.socket_set_gray(bake_color, 0.9)
 		elif bake_type == 'NORMAL':
 			# Normal baked as-is in its own NORMAL pass,
 			# but need to turn off Alpha to avoid gray zones on final render.
-			src_shader = shader_nodes.get_link_surface(mat, target='CYCLES').from_node
+			src_shader = self._get_link_surface_for_bake(mat, source_mat).from_node
 			src_alpha = src_shader.inputs.get('Alpha')  # type: NodeSocket|NodeSocketFloat
 			if src_alpha:
 				src_alpha.default_value = 1.0
@@ -776,17 +947,17 @@ class BaseAtlasBaker:
 			pass
 	
 	def _edit_mats_for_bake(self, bake_obj: 'Object', bake_type: 'str', aov: 'AOV|None'):
-		objects.deselect_all()
-		objects.activate(bake_obj)
-		for slot_idx in range(len(bake_obj.material_slots)):
-			bake_obj.active_material_index = slot_idx
-			mat = bake_obj.material_slots[slot_idx].material
+		# Правки затрагивают только сами материалы, активный объект и активный слот для них не нужны.
+		# В слотах bake_obj - копии материалов из тех же слотов ._bake_obj (см. _bake_image).
+		for slot_idx, slot in enumerate(bake_obj.material_slots):  # type: int, MaterialSlot
+			mat = slot.material
+			source_mat = self._bake_obj.material_slots[slot_idx].material if self._bake_obj is not None else None
 			try:
 				self._ungroup_nodes_for_bake(mat)
 				if aov is not None:
-					self._edit_mat_for_aov(mat, aov)
+					self._edit_mat_for_aov(mat, aov, source_mat)
 				else:
-					self._edit_mat_for_bake(mat, bake_type)
+					self._edit_mat_for_bake(mat, bake_type, source_mat)
 			except Exception as exc:
 				msg = f'Error editing {mat=!r} ({slot_idx=!r}) for {bake_type=!r} {aov=!r} {bake_obj=!r}: {exc}'
 				log.raise_error(RuntimeError, msg, cause=exc)
@@ -798,29 +969,25 @@ class BaseAtlasBaker:
 			msg = f'Error editing materials for {bake_type} bake object {bake_obj}'
 			log.raise_error(RuntimeError, msg, cause=exc)
 	
-	def _bake_image(self, bake_type: 'str', target_image: 'Image'):
+	def _bake_image(self, local_bake_obj: 'Object', bake_type: 'str', target_image: 'Image'):
 		aov = self._aovs.get(bake_type)
 		target_size = tuple(target_image.size)
 		log.info(f"Preparing for bake atlas Image={target_image.name!r} type={bake_type!r} aov={aov!r} size={target_size}...")
 		
-		# Поскольку cycles - ссанина, нам проще сделать копию ._bake_obj
-		# Сделать копии материалов на ._bake_obj
+		# Поскольку cycles - ссанина, нам проще работать с копией ._bake_obj (см. _bake_images)
+		# Сделать копии материалов на копии ._bake_obj
 		# Кастомизировать материалы, вывести всё через EMIT
 		
-		emit_types = ('EMIT', 'ALPHA', 'DIFFUSE', 'METALLIC', 'ROUGHNESS')
-		use_emit = (aov is not None) or (bake_type in emit_types)
+		use_emit = (aov is not None) or (bake_type in self._EMIT_BAKE_TYPES)
 		cycles_bake_type = 'EMIT' if use_emit else bake_type
 		
-		objects.deselect_all()
-		objects.activate(self._bake_obj)
-		commons.ensure_op_finished(bpy.ops.object.duplicate(linked=False), name='bpy.ops.object.duplicate')
-		local_bake_obj = bpy.context.view_layer.objects.active
-		self._bake_obj.hide_set(True)
-		objects.deselect_all()
-		objects.activate(local_bake_obj)
-		commons.ensure_op_finished(bpy.ops.object.make_single_user(
-			object=True, obdata=True, material=True, animation=False,
-		), name='bpy.ops.object.make_single_user')
+		# Запоминаем, что было до правок, что бы потом удалить только созданное для этого запекания
+		node_groups_before = set(bpy.data.node_groups)
+		images_before = set(bpy.data.images)
+		
+		# Геометрия общая для всех запеканий, копируются только материалы, т.к. их правки зависят от типа
+		for slot_idx, slot in enumerate(self._bake_obj.material_slots):  # type: int, MaterialSlot
+			local_bake_obj.material_slots[slot_idx].material = slot.material.copy()
 		
 		self._try_edit_mats_for_bake(local_bake_obj, bake_type, aov)
 		
@@ -828,67 +995,139 @@ class BaseAtlasBaker:
 			n_bake = shader_nodes.prepare_node_for_baking(slot.material)
 			n_bake.image = target_image
 		
-		bpy.context.scene.render.engine = 'CYCLES'
-		bpy.context.scene.cycles.feature_set = 'SUPPORTED'
-		bpy.context.scene.cycles.device = 'GPU'  # can be overriden in before_bake
-		bpy.context.scene.cycles.use_adaptive_sampling = True
-		bpy.context.scene.cycles.adaptive_threshold = 0
-		bpy.context.scene.cycles.adaptive_min_samples = 0
-		bpy.context.scene.cycles.bake_type = cycles_bake_type
-		bpy.context.scene.render.bake.use_pass_direct = False
-		bpy.context.scene.render.bake.use_pass_indirect = False
-		bpy.context.scene.render.bake.use_pass_color = False
-		bpy.context.scene.render.bake.use_pass_emit = use_emit
-		bpy.context.scene.render.bake.normal_space = 'TANGENT'
-		bpy.context.scene.render.bake.margin = 64
-		bpy.context.scene.render.bake.use_clear = True
-		bpy.context.scene.render.use_lock_interface = True
-		bpy.context.scene.render.use_persistent_data = False
+		# Постоянные настройки выставлены в _configure_cycles_once, здесь только зависящие от типа
+		# и те, что обычно переопределяются в before_bake, их нужно сбрасывать перед каждым запеканием.
+		scene = bpy.context.scene
+		scene.cycles.device = 'GPU'  # can be overriden in before_bake
+		scene.cycles.adaptive_threshold = 0
+		scene.cycles.adaptive_min_samples = 0
+		scene.cycles.bake_type = cycles_bake_type
+		scene.render.bake.use_pass_emit = use_emit
+		scene.render.bake.margin = self.get_bake_margin(bake_type, target_image)
+		# Для EMIT нет интегрирования освещения, каждый сэмпл даёт тот же цвет, так что хватает одного.
+		# Число сэмплов сцены восстанавливается после запекания, before_bake может его переопределить.
+		scene_samples = scene.cycles.samples
+		if cycles_bake_type == 'EMIT':
+			scene.cycles.samples = 1
 		
 		self._call_before_bake_safe(bake_type, target_image)
 		
 		log.info(f"Trying to bake atlas Image={target_image.name!r} type={bake_type!r}/{cycles_bake_type!r} aov={aov!r} size={target_size}...")
-		objects.deselect_all()
-		objects.activate(local_bake_obj)
-		gc.collect()  # Подчищаем память прямо перед печкой т.к. оно моного жрёт.
-		bpy.ops.wm.memory_statistics()
+		# Подчищаем память прямо перед печкой т.к. оно моного жрёт.
+		# Датаблоки Blender не держатся циклами Python, так что хватает молодого поколения.
+		gc.collect(0)
+		if log.is_debug():
+			bpy.ops.wm.memory_statistics()
 		bake_start = perf_counter()
-		commons.ensure_op_finished(bpy.ops.object.bake(type=cycles_bake_type, use_clear=True), name='bpy.ops.object.bake')
+		try:
+			self._bake_op(local_bake_obj, cycles_bake_type)
+		finally:
+			scene.cycles.samples = scene_samples
 		bake_time = perf_counter() - bake_start
-		bpy.ops.wm.memory_statistics()
+		if log.is_debug():
+			bpy.ops.wm.memory_statistics()
 		log.info(f"Baked atlas Image={target_image.name!r} type={bake_type!r} aov={aov!r}, time spent: {bake_time:.1f} sec.")
 		
-		garbage_materials = set(slot.material for slot in local_bake_obj.material_slots)
-		mesh = meshes.get_safe(local_bake_obj, strict=True)
-		bpy.context.blend_data.objects.remove(local_bake_obj, do_unlink=True)
-		bpy.context.blend_data.meshes.remove(mesh, do_unlink=True)
-		for mat in garbage_materials:
-			bpy.context.blend_data.materials.remove(mat, do_unlink=True)
-		data.orphans_purge_iter()
+		# batch_remove пересобирает связи данных один раз на пачку, а не на каждый remove.
+		bpy.data.batch_remove(ids=set(slot.material for slot in local_bake_obj.material_slots))
+		# Вместо orphans_purge по всему файлу после каждого запекания
+		# удаляем только новые и уже никем не используемые блоки. Полная чистка - одна, в конце _bake_images.
+		# Проверяется после удаления материалов: блоки, созданные для их копий, к этому моменту без пользователей.
+		new_blocks = (set(bpy.data.node_groups) - node_groups_before) | (set(bpy.data.images) - images_before)
+		garbage = [id_block for id_block in new_blocks if id_block.users == 0]
+		if garbage:
+			bpy.data.batch_remove(ids=garbage)
 		
 		self._call_after_bake_safe(bake_type, target_image)
 	
+	@staticmethod
+	def _bake_op(local_bake_obj: 'Object', cycles_bake_type: 'str'):
+		# Выделение и активный объект подменяются только в контексте оператора,
+		# без обхода всех объектов сцены на снятие выделения.
+		selected = [local_bake_obj]
+		ctx = dict(
+			active_object=local_bake_obj, object=local_bake_obj,
+			selected_objects=selected, selected_editable_objects=selected,
+		)
+		if hasattr(bpy.context, 'temp_override'):
+			with bpy.context.temp_override(**ctx):
+				result = bpy.ops.object.bake(type=cycles_bake_type, use_clear=True)
+		else:
+			# Blender < 3.2
+			result = bpy.ops.object.bake(ctx, type=cycles_bake_type, use_clear=True)
+		commons.ensure_op_finished(result, name='bpy.ops.object.bake')
+	
+	def _configure_cycles_once(self):
+		# Настройки сцены, не зависящие от типа запекания, выставляются один раз на все запекания
+		scene = bpy.context.scene
+		scene.render.engine = 'CYCLES'
+		scene.cycles.feature_set = 'SUPPORTED'
+		scene.cycles.use_adaptive_sampling = True
+		scene.render.bake.use_pass_direct = False
+		scene.render.bake.use_pass_indirect = False
+		scene.render.bake.use_pass_color = False
+		scene.render.bake.normal_space = 'TANGENT'
+		scene.render.bake.use_clear = True
+		if hasattr(scene.render.bake, 'margin_type'):
+			# Blender 3.1+: острова атласа - прямоугольники, простое продолжение края быстрее поиска соседних граней
+			scene.render.bake.margin_type = 'EXTEND'
+		scene.render.use_lock_interface = True
+		scene.render.use_persistent_data = False
+	
+	def _configure_cycles_devices(self):
+		# cycles.device = 'GPU' ничего не даёт, если в настройках Cycles не выбран тип устройств,
+		# тогда запекание молча идёт на CPU. Выбираем первый тип, для которого есть не-CPU устройства,
+		# и включаем только их, что бы CPU не тормозил GPU.
+		addon = bpy.context.preferences.addons.get('cycles')
+		if addon is None:
+			log.warning("Cycles addon preferences are not available, can not configure compute devices.")
+			return
+		cprefs = addon.preferences
+		original_type = cprefs.compute_device_type
+		for device_type in self._CYCLES_DEVICE_TYPES:
+			try:
+				cprefs.compute_device_type = device_type
+			except TypeError:
+				continue  # Тип не поддерживается этой версией Blender
+			cprefs.get_devices()
+			gpus = [d for d in cprefs.devices if d.type != 'CPU']
+			if len(gpus) > 0:
+				for device in cprefs.devices:
+					device.use = device.type != 'CPU'
+				log.info(f"Using {device_type} compute devices: {', '.join(d.name for d in gpus)}")
+				return
+		cprefs.compute_device_type = original_type
+		log.warning("No GPU compute devices found, baking will run on CPU.")
+	
 	def _bake_images(self):
+		self._configure_cycles_once()
+		self._configure_cycles_devices()
 		objects.deselect_all()
 		objects.activate(self._bake_obj)
 		# Настраиваем UV слои под рендер
-		for layer in meshes.get_safe(self._bake_obj).uv_layers:  # type: MeshUVLoopLayer
-			layer.active = layer.name == self._UV_ATLAS
-			layer.active_render = layer.name == self._UV_ORIGINAL
+		# active и active_render эксклюзивны: выставление на нужном слое снимает их с остальных.
+		uv_layers = meshes.get_safe(self._bake_obj).uv_layers
+		for layer in uv_layers:  # type: MeshUVLoopLayer
 			layer.active_clone = False
-		for bake_type, target_image in self._bake_types:
-			for _, other_image in self._bake_types:
-				# Для экономии памяти выгружаем целевые картинки если они прогружены
-				if other_image is not target_image and other_image.has_data:
-					target_image.gl_free()
-					target_image.buffers_free()
-			self._bake_image(bake_type, target_image)
-			# Сразу после рендера целевая картинка скорее всего не нужна
-			if target_image.has_data:
-				target_image.gl_free()
-				target_image.buffers_free()
-			gc.collect()
-		bpy.ops.wm.memory_statistics()
+		uv_layers[self._UV_ATLAS].active = True
+		uv_layers[self._UV_ORIGINAL].active_render = True
+		# Одна копия ._bake_obj со своим мешем на все запекания
+		local_bake_obj = self._bake_obj.copy()
+		local_bake_obj.data = self._bake_obj.data.copy()
+		for collection in self._bake_obj.users_collection:
+			collection.objects.link(local_bake_obj)
+		self._bake_obj.hide_set(True)
+		# Всё, что уже есть в куче Python (острова, трансформы, данные аддонов), живёт до конца запекания,
+		# так что убираем это из отслеживания сборщиком: сборки во время запеканий не будут обходить эти объекты.
+		gc.freeze()
+		try:
+			self._bake_images_on(local_bake_obj)
+		finally:
+			gc.unfreeze()
+			bpy.data.batch_remove(ids=(local_bake_obj, meshes.get_safe(local_bake_obj, strict=True)))
+		data.orphans_purge_iter()
+		if log.is_debug():
+			bpy.ops.wm.memory_statistics()
 		
 		objects.deselect_all()
 		if self._bake_obj is not None:
@@ -897,6 +1136,31 @@ class BaseAtlasBaker:
 			# bpy.context.blend_data.meshes.remove(mesh, do_unlink=True)
 			pass
 	
+	def _bake_images_on(self, local_bake_obj: 'Object'):
+		# Для экономии памяти выгружаем целевые картинки если они прогружены.
+		# Достаточно один раз до начала: после каждого запекания картинка выгружается сразу.
+		for _, target_image in self._bake_types:
+			if target_image.has_data:
+				target_image.gl_free()
+				target_image.buffers_free()
+		for bake_type, target_image in self._bake_types:
+			self._bake_image(local_bake_obj, bake_type, target_image)
+			# Сразу после рендера целевая картинка скорее всего не нужна
+			self._release_target_image(target_image)
+	
+	@staticmethod
+	def _release_target_image(image: 'Image'):
+		# Выгружаем пиксели, что бы к следующему запеканию в памяти не висели все предыдущие картинки.
+		# Сохранять картинку - дело after_bake (см. export_image), здесь на диск ничего не пишется:
+		# если результат не сохранён (картинка is_dirty), выгружать нельзя - он потеряется.
+		if not image.has_data:
+			return
+		if image.is_dirty:
+			log.warning(f"Image {image.name!r} has unsaved bake result, keeping its pixels in memory.")
+			return
+		image.gl_free()
+		image.buffers_free()
+	
 	def _get_target_material_safe(self, obj: 'Object', smat: 'Material'):
 		tmat = None
 		try:
@@ -917,102 +1181,192 @@ class BaseAtlasBaker:
 		
 		lr = reporter.LambdaReporter(report_time=self.report_time, func=do_report)
 		
-		self._perf_find_transform = 0
-		self._perf_apply_transform = 0
-		self._perf_iter_polys = 0
+		apply_time = 0.0
 		
 		for obj in self.objects:
-			bm = None
-			try:
-				mesh = meshes.get_safe(obj)
-				bm = bmesh.new()
-				bm.from_mesh(mesh)
-				self._apply_baked_materials_bmesh(obj, mesh, bm)
-				bm.to_mesh(mesh)
-			finally:
-				if bm is not None:
-					bm.free()
+			mesh = meshes.get_safe(obj)
+			t = perf_counter()
+			self._apply_baked_materials_mesh(obj, mesh)
+			apply_time += perf_counter() - t
 			obj_i += 1
 			mat_i += len(obj.material_slots)
 			lr.ask_report(False)
-			meshes.merge_same_material_slots(obj)
 		lr.ask_report(True)
-		log.info(
-			f'Perf: find_transform: {self._perf_find_transform} '
-			f'apply_transform: {self._perf_apply_transform} iter_polys: {self._perf_iter_polys}'
-		)
+		# Слоты объединяются за один вызов на все объекты:
+		# material_slot_remove_unused и смена выделения выполняются один раз, а не на каждый объект.
+		meshes.merge_same_material_slots(self.objects)
+		log.info(f'Perf: apply_transforms: {apply_time:.3f} sec')
+	
+	@staticmethod
+	def _build_transforms_index(origins: 'np.ndarray', epsilon_x: 'float', epsilon_y: 'float') -> 'tuple':
+		# Индекс для _match_transforms_index по боксам (T, 4) трансформов, как UVTransform.origin_norm.
+		# Не зависит от точек, так что строится один раз на материал и epsilon и переиспользуется всеми объектами.
+		epsilon = np.array((epsilon_x, epsilon_y), dtype=np.float64)
+		lo = origins[:, :2] - epsilon
+		hi = origins[:, :2] + origins[:, 2:] + epsilon
+		if len(origins) < BaseAtlasBaker._MATCH_GRID_MIN_TRANSFORMS:
+			# На паре трансформов сетка не окупается, точки проверяются против каждого
+			return lo, hi, None
+		# Равномерная сетка поверх всех боксов: в каждой клетке - трансформы, задевающие её, по возрастанию индекса.
+		# Точка проверяется только против трансформов своей клетки, а не против всех.
+		grid_n = max(4, int(len(origins) ** 0.5))
+		g_lo, g_hi = lo.min(axis=0), hi.max(axis=0)
+		cell = np.maximum((g_hi - g_lo) / grid_n, 1e-12)
+		c_lo = BaseAtlasBaker._grid_cells(lo, g_lo, cell, grid_n)
+		c_hi = BaseAtlasBaker._grid_cells(hi, g_lo, cell, grid_n)
+		buckets = [list() for _ in range(grid_n * grid_n)]  # type: list[list[int]]
+		for t_idx, (x1, y1), (x2, y2) in zip(range(len(origins)), c_lo.tolist(), c_hi.tolist()):
+			for cx in range(x1, x2 + 1):
+				for cy in range(y1, y2 + 1):
+					buckets[cx * grid_n + cy].append(t_idx)
+		# Клетки в формате CSR: начало и размер списка каждой клетки в общем массиве items
+		counts = np.array([len(b) for b in buckets], dtype=np.int64)
+		starts = np.cumsum(counts) - counts
+		items = np.array([t_idx for b in buckets for t_idx in b], dtype=np.int64)
+		return lo, hi, (g_lo, cell, grid_n, counts, starts, items)
 	
-	def _apply_baked_materials_bmesh(self, obj: 'Object', mesh: 'Mesh', bm: 'BMesh'):
-		# Через BMesh редактировать UV намного быстрее.
-		# Прямой доступ к UV слоям через bpy.types.Mesh раза в 4 медленее.
-		self._bmesh_loops_mem.clear()
-		self._bmesh_loops_mem_hits = 0
-		for material_index in range(len(mesh.materials)):
-			source_mat = mesh.materials[material_index]
+	@staticmethod
+	def _grid_cells(xy: 'np.ndarray', g_lo: 'np.ndarray', cell: 'np.ndarray', grid_n: 'int') -> 'np.ndarray':
+		return np.clip(((xy - g_lo) / cell).astype(np.int64), 0, grid_n - 1)
+	
+	@staticmethod
+	def _match_transforms_index(points: 'np.ndarray', index: 'tuple') -> 'np.ndarray':
+		# Векторный аналог UVTransform.is_match: для каждой точки (N, 2) индекс первого подходящего трансформа или -1.
+		lo, hi, grid = index
+		if grid is None:
+			matches = np.logical_and(points >= lo[:, None], points <= hi[:, None]).all(axis=2)
+			return np.where(matches.any(axis=0), matches.argmax(axis=0), -1)
+		g_lo, cell, grid_n, counts, starts, items = grid
+		pc = BaseAtlasBaker._grid_cells(points, g_lo, cell, grid_n)
+		p_cell = pc[:, 0] * grid_n + pc[:, 1]
+		p_start, p_count = starts[p_cell], counts[p_cell]
+		choice = np.full(len(points), -1, dtype=np.int64)
+		# k-й кандидат каждой точки, пока у кого-то они остались и совпадение ещё не найдено
+		for k in range(int(p_count.max()) if len(points) > 0 else 0):
+			todo = np.flatnonzero((choice < 0) & (p_count > k))
+			if len(todo) == 0:
+				break
+			cand = items[p_start[todo] + k]
+			p = points[todo]
+			inside = np.logical_and(p >= lo[cand], p <= hi[cand]).all(axis=1)
+			choice[todo[inside]] = cand[inside]
+		return choice
+	
+	def _apply_contexts(self, obj: 'Object', mesh: 'Mesh') -> 'list[tuple]':
+		# Всё, что нужно для слотов obj, одним списком, до обработки полигонов:
+		# (индекс слота, материал, трансформы, индекс их боксов, их аффинные коэффициенты, целевой материал, имя UV)
+		contexts = list()
+		for material_index, source_mat in enumerate(mesh.materials):
 			transforms = self._transforms.get(source_mat)
 			if transforms is None:
 				continue  # Нет преобразований для данного материала
+			# Боксы и коэффициенты одни на материал, общие для всех объектов
+			origins = self._transforms_origin.get(source_mat)
+			if origins is None:
+				origins = np.array([t.origin_norm for t in transforms], dtype=np.float64).reshape(-1, 4)
+				self._transforms_origin[source_mat] = origins
+			affines = self._transforms_affine.get(source_mat)
+			if affines is None:
+				affines = np.array([t.affine() for t in transforms], dtype=np.float64).reshape(-1, 4)
+				self._transforms_affine[source_mat] = affines
 			# Дегенеративная геометрия вызывает проблемы, по этому нужен epsilon.
 			# Зазор между боксами не менее epsilon материала, по этому возьмём половину.
 			epsilon = self._get_epsilon_safe(obj, source_mat)
 			src_size_x, src_size_y = self._matsizes[source_mat]
 			epsilon_x, epsilon_y = epsilon / src_size_x / 2, epsilon / src_size_y / 2
 			target_mat = self._materials.get((obj, source_mat))
-			uv_name = self.get_uv_name(obj, source_mat) or 0
-			bm_uv_layer = bm.loops.layers.uv[uv_name]  # type: BMLayerItem
-			# Здесь мы, получается, обходм все фейсы по несколько раз (на каждый материал)
-			# Но это лучше, чем проходить один раз, но каждый раз дёргать
-			# dict.get(bm_face.material_index) и распаковывать метаданные
-			_t3 = perf_counter()
-			bm.faces.ensure_lookup_table()
-			for bm_face in bm.faces:
-				if bm_face.material_index != material_index:
-					continue
-				# Среднее UV фейса. По идее можно брать любую точку для теста принадлежности,
+			uv_name = self._get_uv_name_safe(obj, source_mat)
+			# Индекс боксов зависит только от материала и epsilon, общий для всех объектов с такими же
+			index_key = (source_mat, epsilon_x, epsilon_y)
+			index = self._transforms_index.get(index_key)
+			if index is None:
+				index = self._transforms_index[index_key] = self._build_transforms_index(origins, epsilon_x, epsilon_y)
+			contexts.append((material_index, source_mat, transforms, index, affines, target_mat, uv_name))
+		return contexts
+	
+	def _apply_baked_materials_mesh(self, obj: 'Object', mesh: 'Mesh'):
+		# UV читаются и пишутся сразу целыми слоями через foreach_get/foreach_set,
+		# а поиск и применение трансформов делаются над массивами NumPy.
+		# Это намного быстрее, чем обходить каждый loop через BMesh.
+		poly_count, loop_count = len(mesh.polygons), len(mesh.loops)
+		mat_idx = np.empty(poly_count, dtype=np.int32)
+		loop_start = np.empty(poly_count, dtype=np.int32)
+		loop_total = np.empty(poly_count, dtype=np.int32)
+		mesh.polygons.foreach_get('material_index', mat_idx)
+		mesh.polygons.foreach_get('loop_start', loop_start)
+		mesh.polygons.foreach_get('loop_total', loop_total)
+		mat_count = len(mesh.materials)
+		if mat_count > 0:
+			# Как и в Blender, индексы за пределами слотов относятся к последнему слоту
+			np.clip(mat_idx, 0, mat_count - 1, out=mat_idx)
+		# Слоты с одинаковым материалом сводятся к первому такому слоту ещё до поиска трансформов,
+		# так полигоны материала обрабатываются одним куском, а не по куску на каждый слот-дубликат.
+		slot_remap = list(range(len(mesh.materials)))
+		first_slot = dict()
+		for material_index, source_mat in enumerate(mesh.materials):
+			if source_mat is not None:
+				slot_remap[material_index] = first_slot.setdefault(source_mat, material_index)
+		slots_remapped = len(first_slot) < sum(1 for m in mesh.materials if m is not None)
+		if slots_remapped:
+			mat_idx = np.array(slot_remap, dtype=np.int32)[mat_idx]
+		# Полигоны каждого слота одним проходом: стабильная сортировка по индексу материала и разбиение по границам
+		by_mat_order = np.argsort(mat_idx, kind='stable')
+		by_mat_bounds = np.searchsorted(mat_idx[by_mat_order], np.arange(mat_count + 1))
+		# Прочитанные слои UV: имя -> (данные слоя, массив (N, 2), средние UV всех полигонов (P, 2))
+		uv_buffers = dict()  # type: dict[str|int, tuple[list[MeshUVLoop], np.ndarray, np.ndarray]]
+		for material_index, source_mat, transforms, index, affines, target_mat, uv_name in \
+				self._apply_contexts(obj, mesh):
+			uv_buffer = uv_buffers.get(uv_name)
+			if uv_buffer is None:
+				uv_data = mesh.uv_layers[uv_name].data  # type: list[MeshUVLoop]
+				uvs = np.empty(loop_count * 2, dtype=np.float32)
+				uv_data.foreach_get('uv', uvs)
+				uvs = uvs.reshape(-1, 2)
+				# Среднее UV полигона. По идее можно брать любую точку для теста принадлежности,
 				# но я не хочу проблем с пограничными случаями.
-				# Нужно тестировать, скорее всего тут можно ускорить.
-				mean_uv = Vector((0, 0))
-				for bm_loop in bm_face.loops:
-					mean_uv += bm_loop[bm_uv_layer].uv
-				mean_uv /= len(bm_face.loops)
-				transform = None
-				# Поиск трансформа для данного полигона
-				_t1 = perf_counter()
-				for t in transforms:
-					# Должно работать без эпсилонов
-					if t.is_match(mean_uv, epsilon_x=epsilon_x, epsilon_y=epsilon_y):
-						transform = t
-						break
-				self._perf_find_transform += perf_counter() - _t1
-				if transform is None:
+				# Считается один раз на слой, до применения любых трансформов.
+				means_all = uv.uv_means_array(uvs, loop_start, loop_total)
+				uv_buffer = uv_buffers[uv_name] = (uv_data, uvs, means_all)
+			_, uvs, means_all = uv_buffer
+			faces = by_mat_order[by_mat_bounds[material_index]:by_mat_bounds[material_index + 1]]
+			if len(faces) > 0:
+				# Индексы всех loop'ов полигонов материала, подряд по полигонам
+				totals = loop_total[faces]
+				offsets = np.cumsum(totals) - totals
+				loops = np.repeat(loop_start[faces] - offsets, totals) + np.arange(offsets[-1] + totals[-1])
+				face_uvs = uvs[loops].astype(np.float64)
+				means = means_all[faces]
+				# Поиск трансформа для каждого полигона
+				choice = self._match_transforms_index(means, index)
+				missing = np.flatnonzero(choice < 0)
+				if len(missing) > 0:
 					# Такая ситуация не должна случаться:
 					# Если материал подлежал запеканию, то все участки должны были ранее покрыты трансформами.
-					msg = f'No UV transform for Obj={obj.name!r}, Mesh={mesh.name!r}, SMat={source_mat.name!r}, Poly={bm_face!r}, UV={mean_uv!r}, Transforms:'
+					poly, mean_uv = int(faces[missing[0]]), tuple(means[missing[0]])
+					msg = f'No UV transform for Obj={obj.name!r}, Mesh={mesh.name!r}, SMat={source_mat.name!r}, Poly={poly!r}, UV={mean_uv!r}, Transforms:'
 					log.error(msg)
 					for transform in transforms:
-						log.error(f'\t- {transform !r}')
-					raise AssertionError(msg, obj, source_mat, repr(bm_face), mean_uv, transforms)
-				_t2 = perf_counter()
-				for bm_loop in bm_face.loops:
-					if bm_loop.index in self._bmesh_loops_mem:
-						# Что бы не применить трансформ дважды к одному loop.
-						# Хотя как я понял в bmesh они не пере-используются
-						# Нужно изучать, возможно можно убрать self._already_processed_loops вовсе
-						self._bmesh_loops_mem_hits += 1
-						continue
-					self._bmesh_loops_mem.add(bm_loop.index)
-					vec2 = bm_loop[bm_uv_layer].uv
-					vec2 = transform.apply(vec2)
-					bm_loop[bm_uv_layer].uv = vec2
-				self._perf_apply_transform += perf_counter() - _t2
-			self._perf_iter_polys += perf_counter() - _t3
-			# Внимание! Меняем меш, хотя потом она будет перезаписана из bmesh.
-			# Но это ОК, т.к. bmesh похуй на материалы, там хранятся только индексы.
+						log.error(f'\t- {transform!s}')
+					raise AssertionError(msg, obj, source_mat, poly, mean_uv, transforms)
+				if len(affines) == 1:
+					# Единственный трансформ: все полигоны уже проверены, коэффициенты общие для всех loop'ов
+					affine = affines[0]
+				else:
+					# Аффинные коэффициенты трансформа каждого loop, всё применяется одной операцией
+					affine = affines[np.repeat(choice, totals)]
+				face_uvs *= affine[..., :2]
+				face_uvs += affine[..., 2:]
+				# Каждый loop принадлежит ровно одному полигону, а полигон - одному материалу,
+				# так что запись без проверок на повторное применение.
+				uvs[loops] = face_uvs
 			mesh.materials[material_index] = target_mat
 			obj.material_slots[material_index].material = target_mat
-		if log.is_debug():
-			log.info(f"BMesh loops hits for {obj.name!r} = {self._bmesh_loops_mem_hits!r}")
-		self._bmesh_loops_mem.clear()
+		for uv_data, uvs, _ in uv_buffers.values():
+			uv_data.foreach_set('uv', uvs.ravel())
+		if slots_remapped:
+			# Опустевшие слоты-дубликаты уберёт merge_same_material_slots
+			mesh.polygons.foreach_set('material_index', mat_idx)
+		mesh.update()
 	
 	def bake_atlas(self):
 		"""
@@ -1028,17 +1382,17 @@ class BaseAtlasBaker:
 		self._make_duplicates()
 		# Разбивка вспомогательных дубликатов по материалам
 		self._separate_duplicates()
-		# Может оказаться так, что не все материалы подлежат запеканию
-		# Вспомогательные дубликаты с не нужными материалами удаляются
-		self._cleanup_duplicates()
-		# Остающиеся вспомогательные дубликаты группируются по материалам
-		self._group_duplicates()
+		# Запоминаем исходные объекты и материалы копий.
+		# Может оказаться так, что не все материалы подлежат запеканию,
+		# вспомогательные дубликаты с не нужными материалами удаляются,
+		# остающиеся группируются по материалам - всё одним проходом.
+		self._map_duplicates()
 		# Для каждого материала выполняем поиск островов
 		self._find_islands()
 		# После того как острова найдены, вспомогательные дубликаты более не нужны, удаляем их
 		self._delete_groups()
 		# Острова нужно разместить на атласе.
-		# Для этого используется mathutils.geometry.box_pack_2d
+		# Для этого используются упаковщики из .packing
 		# Для этого нужно сконвертировать
 		self._create_transforms_from_islands()
 		self._pack_islands()
@@ -183,6 +183,9 @@ class CommonAtlasBaker(base_baker.BaseAtlasBaker):
 	def get_epsilon(self, _obj: 'Object', _mat: 'Material') -> 'float':
 		return 0.5 if not self.fast_mode else 2.0
 	
+	def get_bake_margin(self, bake_type: str, target_image: 'Image') -> 'int':
+		return super().get_bake_margin(bake_type, target_image) if not self.fast_mode else 1
+	
 	def before_bake(self, bake_type: str, target_image: 'Image'):
 		"""
 		Some common rendering settings adjust.
@@ -202,8 +205,6 @@ class CommonAtlasBaker(base_baker.BaseAtlasBaker):
 		scene = self.get_scene()
 		cycles = scene.cycles
 		
-		scene.render.bake.margin = 1 if self.fast_mode else 64
-		
 		image_size = target_image.size
 		avg_size = image_size[0] * 0.5 + image_size[1] * 0.5  # type: float|int|str
 		avg_size = 1 << round(math.log2(max(2, avg_size)))
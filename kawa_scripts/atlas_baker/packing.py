@@ -0,0 +1,120 @@
+# Kawashirov's Scripts (c) 2021 by Sergey V. Kawashirov
+#
+# Kawashirov's Scripts is licensed under a
+# Creative Commons Attribution-NonCommercial-ShareAlike 3.0 Unported License.
+#
+# You should have received a copy of the license along with this
+# work.  If not, see <http://creativecommons.org/licenses/by-nc-sa/3.0/>.
+#
+#
+"""
+Rectangle packers used by `kawa_scripts.atlas_baker.BaseAtlasBaker` to place islands on atlas.
+All packers take boxes in the same format as `mathutils.geometry.box_pack_2d`:
+a list of `[x, y, width, height, ...]` lists, `x` and `y` are written in place.
+"""
+
+from math import sqrt, inf
+
+import numpy as _np
+
+import typing as _typing
+
+if _typing.TYPE_CHECKING:
+	from typing import Sequence, List
+
+
+def potpack(boxes: 'Sequence[List]') -> 'tuple[float, float]':
+	"""
+	Single-pass shelf packer with best-fit into free spaces, port of mapbox's `potpack`.
+	Boxes are placed tallest first, order of `boxes` itself is not changed.
+	Returns width and height of the packed area.
+	"""
+	area, max_width = 0.0, 0.0
+	for box in boxes:
+		area += box[2] * box[3]
+		max_width = max(max_width, box[2])
+	# Ширина стартовой полки - чуть больше стороны квадрата той же площади
+	start_width = max(sqrt(area / 0.95), max_width)
+	# Свободные места: x, y, w, h
+	spaces = [[0.0, 0.0, start_width, inf]]  # type: List[List[float]]
+	width, height = 0.0, 0.0
+	for box in sorted(boxes, key=lambda b: b[3], reverse=True):
+		bw, bh = box[2], box[3]
+		# С конца, что бы сначала проверять меньшие места
+		for i in range(len(spaces) - 1, -1, -1):
+			space = spaces[i]
+			if bw > space[2] or bh > space[3]:
+				continue
+			box[0], box[1] = space[0], space[1]
+			width = max(width, space[0] + bw)
+			height = max(height, space[1] + bh)
+			if bw == space[2] and bh == space[3]:
+				# Место занято целиком
+				last = spaces.pop()
+				if i < len(spaces):
+					spaces[i] = last
+			elif bh == space[3]:
+				# Занято по высоте, остаток справа
+				space[0] += bw
+				space[2] -= bw
+			elif bw == space[2]:
+				# Занято по ширине, остаток сверху
+				space[1] += bh
+				space[3] -= bh
+			else:
+				# Остаток справа становится новым местом, остаток сверху - в текущем
+				spaces.append([space[0] + bw, space[1], space[2] - bw, bh])
+				space[1] += bh
+				space[3] -= bh
+			break
+	return width, height
+
+
+def maxrects(boxes: 'Sequence[List]', width: 'float', height: 'float') -> 'bool':
+	"""
+	MaxRects packer with Best Short Side Fit heuristic (Jukka Jylänki), without rotation.
+	Boxes are placed in given order into `width` x `height` bin, larger boxes first works best.
+	Returns `False` if some box does not fit, positions of boxes are undefined in that case.
+	"""
+	# Свободные прямоугольники, могут пересекаться между собой: x1, y1, x2, y2.
+	# Их бывают тысячи, по этому все проверки делаются над массивом целиком.
+	free = _np.array(((0.0, 0.0, width, height),), dtype=_np.float64)
+	for box in boxes:
+		bw, bh = box[2], box[3]
+		# Best Short Side Fit: меньший остаток по короткой стороне, при равенстве - по длинной
+		dw, dh = free[:, 2] - free[:, 0] - bw, free[:, 3] - free[:, 1] - bh
+		short, long = _np.minimum(dw, dh), _np.maximum(dw, dh)
+		short[(dw < 0) | (dh < 0)] = inf
+		best_short = short.min()
+		if best_short == inf:
+			return False
+		candidates = _np.flatnonzero(short == best_short)
+		x1, y1 = free[candidates[_np.argmin(long[candidates])], :2].tolist()
+		box[0], box[1] = x1, y1
+		x2, y2 = x1 + bw, y1 + bh
+		# Каждый пересечённый свободный прямоугольник заменяется на до 4 максимальных остатков вокруг бокса
+		hit = (free[:, 0] < x2) & (free[:, 2] > x1) & (free[:, 1] < y2) & (free[:, 3] > y1)
+		kept, hits = free[~hit], free[hit]
+		left, right = hits[hits[:, 0] < x1], hits[hits[:, 2] > x2]
+		bottom, top = hits[hits[:, 1] < y1], hits[hits[:, 3] > y2]
+		left[:, 2], right[:, 0], bottom[:, 3], top[:, 1] = x1, x2, y1, y2
+		split = _np.concatenate((left, right, bottom, top))
+		# Старые прямоугольники уже не вложены друг в друга и не могут оказаться внутри новых,
+		# так что проверяются только новые: против старых и против друг друга.
+		keep = ~_contained(kept, split).any(axis=0)
+		inner = _contained(split, split)
+		same = inner & inner.T
+		# Из одинаковых новых остаётся первый
+		_np.fill_diagonal(inner, False)
+		inner &= ~same | ~_np.tri(len(split), dtype=bool)
+		keep &= ~inner.any(axis=0)
+		free = _np.concatenate((kept, split[keep]))
+	return True
+
+
+def _contained(outer: '_np.ndarray', inner: '_np.ndarray') -> '_np.ndarray':
+	# Матрица (len(outer), len(inner)): содержит ли прямоугольник outer прямоугольник inner
+	o, i = outer[:, None, :], inner[None, :, :]
+	return (o[..., 0] <= i[..., 0]) & (o[..., 1] <= i[..., 1]) & (i[..., 2] <= o[..., 2]) & (i[..., 3] <= o[..., 3])
+
+__all__ = ['potpack', 'maxrects']
@@ -18,7 +18,7 @@ class UVTransform:
 	"""
 	Internal class used by `BaseAtlasBaker` as mapping between UV areas on original Materials and UV areas on atlas.
 	"""
-	__slots__ = ('material', 'origin_norm', 'padded_norm', 'packed_norm')
+	__slots__ = ('material', 'origin_norm', 'padded_norm', 'packed_norm', '_scale', '_offset')
 	
 	def __init__(self):
 		# Хранить множество вариантов координат затратно по памяти,
@@ -33,10 +33,15 @@ class UVTransform:
 		# packed использует промежуточные координаты во время упаковки,
 		# использует нормализованные координаты после упаковки
 		self.packed_norm = None  # type: Vector # len == 4
+		# Аффинное преобразование padded_norm -> packed_norm, см. finalize
+		self._scale = None  # type: tuple[float, float]
+		self._offset = None  # type: tuple[float, float]
 	
 	def __str__(self) -> str: return _internals.common_str_slots(self, self.__slots__)
 	
-	def __repr__(self) -> str: return _internals.common_str_slots(self, self.__slots__)
+	def __repr__(self) -> str:
+		# Короткий: repr попадает в аргументы исключений и списки трансформов, полный вид - через str
+		return f"{type(self).__name__}(material={getattr(self.material, 'name', None)!r}, packed_norm={self.packed_norm!r})"
 	
 	def is_match(self, vec2_norm: 'Vector', epsilon_x: 'float' = 0, epsilon_y: 'float' = 0):
 		v = self.origin_norm
@@ -44,25 +49,27 @@ class UVTransform:
 		y1, y2 = v.y - epsilon_y, v.y + v.w + epsilon_y
 		return x1 <= vec2_norm.x <= x2 and y1 <= vec2_norm.y <= y2
 	
-	@staticmethod
-	def _in_box(v2: 'Vector', box: 'Vector'):
-		# Координаты vec2 внутри box как 0..1
-		v2.x = (v2.x - box.x) / box.z
-		v2.y = (v2.y - box.y) / box.w
-	
-	@staticmethod
-	def _out_box(v2: 'Vector', box: 'Vector'):
-		# Координаты 0..1 внутри box вне его
-		v2.x = v2.x * box.z + box.x
-		v2.y = v2.y * box.w + box.y
+	def finalize(self):
+		# Должно быть вызвано после упаковки, когда packed_norm уже известен.
+		# (uv - pd.xy) / pd.zw * pk.zw + pk.xy == uv * scale + offset
+		pd, pk = self.padded_norm, self.packed_norm
+		sx, sy = pk.z / pd.z, pk.w / pd.w
+		self._scale = (sx, sy)
+		self._offset = (pk.x - pd.x * sx, pk.y - pd.y * sy)
 	
 	def apply(self, vec2_norm: 'Vector') -> 'Vector':
 		# Преобразование padded_norm -> packed_norm
 		uv = vec2_norm.xy  # копирование
-		self._in_box(uv, self.padded_norm)
-		self._out_box(uv, self.packed_norm)
+		sx, sy = self._scale
+		ox, oy = self._offset
+		uv.x = uv.x * sx + ox
+		uv.y = uv.y * sy + oy
 		return uv
 	
+	def affine(self) -> 'tuple[float, float, float, float]':
+		# Коэффициенты apply: sx, sy, ox, oy
+		return (*self._scale, *self._offset)
+	
 	def iterate_corners(self) -> 'Generator[tuple[int, tuple[float, float]]]':
 		# Обходу углов: #, оригинальная UV, атласная UV
 		pd, pk = self.padded_norm, self.packed_norm
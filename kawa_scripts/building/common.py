@@ -189,7 +189,7 @@ class CommonBuilder(ABC):
 				self._reveal_hidden_single(obj, mesh)
 	
 	def _find_armature_links(self) -> 'dict[Object, set[Object]]':
-		links = dict()  # type: dict[Object, set[Object]]
+		links = collections.defaultdict(set)  # type: dict[Object, set[Object]]
 		for obj in self.ensure_processing_scene().objects:
 			mesh = meshes.get_safe(obj, strict=False)
 			if mesh is None:
@@ -197,8 +197,7 @@ class CommonBuilder(ABC):
 			for modifier in obj.modifiers:
 				arm_m = modifiers.as_armature(modifier, strict=False)
 				if arm_m and arm_m.object:
-					link = commons.dict_get_or_add(links, arm_m.object, set)
-					link.add(obj)
+					links[arm_m.object].add(obj)
 		return links
 	
 	def merge_weights_action(self, arm_obj: 'Object', mesh_obj: 'Object') -> 'dict[str, dict[str, float]]|None':
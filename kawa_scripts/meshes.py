@@ -10,6 +10,7 @@
 import bpy as _bpy
 import mathutils as _mu
 import bmesh as _bmesh
+import numpy as _np
 
 from . import _internals
 from ._internals import log as _log
@@ -133,21 +134,17 @@ def _merge_same_material_slots_single(obj: 'Object', mesh: 'Mesh'):
 			# Отображения самого на себя тоже включены,
 			# что бы не делать лишний None-чек на долгой итерации
 			mapping[idx] = indices[0]
-		if len(indices) > 2:
+		if len(indices) > 1:
 			need_remap = True
 	if not need_remap:
 		return False
 	# Этап 3: производим замену
 	_log.info(f"Merging same slots on {obj!r}: {mapping!r}")
-	bm = _bmesh.new()
-	try:
-		bm.from_mesh(mesh)
-		bm.faces.ensure_lookup_table()
-		for face in bm.faces:
-			face.material_index = mapping[face.material_index]
-		bm.to_mesh(mesh)
-	finally:
-		bm.free()
+	# Индексы материалов читаются и пишутся целиком, без BMesh и обхода фейсов
+	mat_idx = _np.empty(len(mesh.polygons), dtype=_np.int32)
+	mesh.polygons.foreach_get('material_index', mat_idx)
+	mesh.polygons.foreach_set('material_index', _np.array(mapping, dtype=_np.int32)[mat_idx])
+	mesh.update()
 	return True
 
 
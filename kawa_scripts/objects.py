@@ -61,12 +61,16 @@ def select(objs: 'HandyMultiObject', state: 'bool' = True, view_layer: 'ViewLaye
 
 def activate(objs: 'HandyMultiObject', view_layer: 'ViewLayer' = None, op: 'Operator' = None):
 	try:
+		if view_layer is None:
+			view_layer = _bpy.context.view_layer
+		last = None
 		for obj in resolve_objects(objs):
-			if view_layer is None:
-				view_layer = _bpy.context.view_layer
 			obj.hide_set(False, view_layer=view_layer)
 			obj.select_set(True, view_layer=view_layer)
-			view_layer.objects.active = obj
+			last = obj
+		# Активным остаётся последний, так что назначается один раз
+		if last is not None:
+			view_layer.objects.active = last
 	except Exception as exc:
 		_log.error("Can not activate {!r}: {!r}".format(objs, exc), op=op)
 		raise exc
@@ -77,8 +81,9 @@ def deselect_all(view_layer: 'ViewLayer' = None):
 		view_layer = _bpy.context.view_layer
 	# ensure_op_finished(bpy.ops.object.select_all(action='DESELECT'), name="bpy.ops.object.select_all(action='DESELECT')")
 	# Это быстрее, чем оператор, и позволяет отжать скрытые объекты
-	while len(view_layer.objects.selected) > 0:
-		view_layer.objects.selected[0].select_set(False, view_layer=view_layer)
+	# Список выделенных собирается один раз: каждое обращение к .selected заново обходит все объекты слоя
+	for obj in list(view_layer.objects.selected):
+		obj.select_set(False, view_layer=view_layer)
 	view_layer.objects.active = None
 
 
@@ -18,7 +18,7 @@ from ._internals import log as _log
 import typing as _typing
 
 if _typing.TYPE_CHECKING:
-	from typing import Optional, List
+	from typing import Optional, List, Dict
 	from bpy.types import Material, Node, NodeTree, NodeSocket, NodeLink, ShaderNode
 	from bpy.types import NodeSocket, NodeSocketColor, NodeSocketFloat
 	
@@ -99,10 +99,31 @@ def prepare_node_for_baking(mat: 'Material') -> 'ShaderNodeTexImage|Node':
 	return n_bake
 
 
-def socket_copy_input(from_in_socket: 'NodeSocket|NodeSocketColor', to_in_socket: 'NodeSocket|NodeSocketColor', copy_default=False):
+def links_by_to_socket(node_tree: 'NodeTree') -> 'dict[int, NodeLink]':
+	"""
+	Maps `as_pointer()` of every linked input socket of `node_tree` to its (first) `NodeLink`.
+	Walks links of node tree once, useful for `socket_copy_input` on many sockets.
+	"""
+	mapping = dict()
+	for link in node_tree.links:
+		mapping.setdefault(link.to_socket.as_pointer(), link)
+	return mapping
+
+
+def socket_set_gray(socket: 'NodeSocketColor', value: 'float'):
+	"""
+	Sets `default_value` of COLOR `socket` to opaque gray `(value, value, value, 1.0)` in a single assignment.
+	"""
+	socket.default_value = (value, value, value, 1.0)
+
+
+def socket_copy_input(from_in_socket: 'NodeSocket|NodeSocketColor', to_in_socket: 'NodeSocket|NodeSocketColor', copy_default=False,
+		links_map: 'dict[int, NodeLink]|None' = None):
 	"""
 	Copies (single) link and to `from_in_socket` to `to_in_socket` too.
-	Copies `default_value` too, but only COLOR->COLOR, VALUE->VALUE and VALUE->COLOR are supported.
+	If `copy_default` is set, copies `default_value` of `from_in_socket` to `to_in_socket` too,
+	but only COLOR->COLOR, VALUE->VALUE and VALUE->COLOR (as opaque gray) are supported.
+	`links_map` from `links_by_to_socket` can be provided to avoid scanning links of node tree on every call.
 	"""
 	if from_in_socket.id_data != to_in_socket.id_data:
 		raise ValueError(f"Sockets {from_in_socket!r} and {to_in_socket!r} from different node trees!")
@@ -113,17 +134,20 @@ def socket_copy_input(from_in_socket: 'NodeSocket|NodeSocketColor', to_in_socket
 	if to_in_socket.is_linked:
 		raise ValueError(f"Socket {to_in_socket!r} already have a links: {to_in_socket.links!r}")
 	
-	if from_in_socket.is_linked:
-		from_in_socket.id_data.links.new(from_in_socket.links[0].from_socket, to_in_socket)
+	if links_map is not None:
+		from_link = links_map.get(from_in_socket.as_pointer())
+	else:
+		from_link = from_in_socket.links[0] if from_in_socket.is_linked else None
+	if from_link is not None:
+		from_in_socket.id_data.links.new(from_link.from_socket, to_in_socket)
 	
 	if copy_default:
 		if from_in_socket.type == 'COLOR' and to_in_socket.type == 'COLOR':
-			to_in_socket.default_value[:] = to_in_socket.default_value
+			to_in_socket.default_value = from_in_socket.default_value
 		elif from_in_socket.type == 'VALUE' and to_in_socket.type == 'VALUE':
-			to_in_socket.default_value = to_in_socket.default_value
+			to_in_socket.default_value = from_in_socket.default_value
 		elif from_in_socket.type == 'VALUE' and to_in_socket.type == 'COLOR':
-			value = to_in_socket.default_value
-			to_in_socket.default_value[:] = (value, value, value, 1)
+			socket_set_gray(to_in_socket, from_in_socket.default_value)
 		else:
 			m_from = f"{from_in_socket!r} ({from_in_socket.default_value!r})"
 			m_to = f"{to_in_socket!r} ({to_in_socket.default_value!r})"
@@ -136,28 +160,37 @@ def get_socket_aov(mat: 'Material', aov_name: 'str', aov_type: 'str') -> 'NodeSo
 	with matching name `aov_name` and `aov_type` (`'VALUE'`, `'COLOR'`).
 	Returns `None` if not found, raises `MaterialConfigurationError` if multiple found.
 	"""
-	if aov_type not in ('VALUE', 'COLOR'):
-		raise ValueError(f"Invalid aov_type: {aov_type!r}")
+	return get_sockets_aov(mat, {aov_name: aov_type}).get(aov_name)
+
+
+def get_sockets_aov(mat: 'Material', aov_types: 'Dict[str, str]') -> 'Dict[str, NodeSocket|NodeSocketFloat|NodeSocketColor]':
+	"""
+	Same as `get_socket_aov`, but for many AOVs at once with a single pass over nodes of `mat`.
+	`aov_types` maps AOV names to their types (`'VALUE'`, `'COLOR'`).
+	Returns mapping of AOV names to found `NodeSocket`s, names not found are omitted.
+	"""
+	for aov_type in aov_types.values():
+		if aov_type not in ('VALUE', 'COLOR'):
+			raise ValueError(f"Invalid aov_type: {aov_type!r}")
 	
-	aov_sockets = list()
+	aov_sockets = dict()  # type: Dict[str, List[NodeSocket]]
 	for node in mat.node_tree.nodes:
 		if node.type != 'OUTPUT_AOV' or not isinstance(node, _bpy.types.ShaderNodeOutputAOV):
 			continue
-		if node.name != aov_name:
+		aov_type = aov_types.get(node.name)
+		if aov_type is None:
 			continue
 		socket = node.inputs['Value' if aov_type == 'VALUE' else 'Color']
 		links = socket.links  # type: tuple[NodeLink]
 		if len(links) > 1:
 			raise _commons.MaterialConfigurationError(mat, f"Soket {socket!r} has too many ({len(links)}/{socket.link_limit}) links {links!r}")
-		aov_sockets.append(socket)
+		aov_sockets.setdefault(node.name, list()).append(socket)
 	
-	if len(aov_sockets) > 1:
-		raise _commons.MaterialConfigurationError(mat,
-			f"Multiple ({len(aov_sockets)}) sockets found for AOV {aov_name!r} of type {aov_type!r}.")
-	elif len(aov_sockets) < 1:
-		return None
-	else:
-		return aov_sockets[0]
+	for aov_name, sockets in aov_sockets.items():
+		if len(sockets) > 1:
+			raise _commons.MaterialConfigurationError(mat,
+				f"Multiple ({len(sockets)}) sockets found for AOV {aov_name!r} of type {aov_types[aov_name]!r}.")
+	return {aov_name: sockets[0] for aov_name, sockets in aov_sockets.items()}
 
 
 def create_aov(mat: 'Material', aov_name: 'str', aov_type: 'str', value=None) -> 'NodeSocket':
@@ -183,7 +216,7 @@ def create_aov(mat: 'Material', aov_name: 'str', aov_type: 'str', value=None) ->
 		if aov_type == 'VALUE':
 			aov_socket.default_value = value
 		else:
-			aov_socket.default_value[:] = (value, value, value, 1)
+			socket_set_gray(aov_socket, value)
 	elif isinstance(value, collections.abc.Sequence) and len(value) == 3 and aov_type == 'COLOR':
 		aov_socket.default_value[:3] = value
 	elif isinstance(value, collections.abc.Sequence) and len(value) == 4 and aov_type == 'COLOR':
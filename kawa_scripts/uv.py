@@ -11,8 +11,11 @@
 Useful tools for UV Layers
 """
 
+import math as _math
+
 import bpy as _bpy
 import mathutils as _mu
+import numpy as _np
 
 from . import _internals
 from . import commons as _commons
@@ -40,6 +43,35 @@ def uv_area_bmesh(bm_face: 'BMFace', bm_uv_layer: 'BMLayerItem'):
 	return _meshes.poly2_area2(list(bm_loop[bm_uv_layer].uv for bm_loop in bm_face.loops))
 
 
+def uv_areas_array(uvs: '_np.ndarray', loop_start: '_np.ndarray', loop_total: '_np.ndarray') -> '_np.ndarray':
+	"""
+	Returns areas of all polygons at once.
+	`uvs` is (N, 2) array of UV coords of all loops (obtained by `foreach_get`),
+	`loop_start` and `loop_total` are arrays of polygons (obtained by `foreach_get` too).
+	"""
+	# Формула Гаусса для всех полигонов разом: у каждого loop есть следующий в том же полигоне,
+	# у последнего loop полигона следующий - первый.
+	loop_end = loop_start + loop_total
+	loop_next = _np.arange(1, len(uvs) + 1)
+	loop_next[loop_end - 1] = loop_start
+	x, y = uvs[:, 0].astype(_np.float64), uvs[:, 1].astype(_np.float64)
+	cross = x * y[loop_next] - x[loop_next] * y
+	# Сумма по каждому полигону через кумулятивную сумму, не зависит от порядка полигонов
+	cross_sum = _np.concatenate(((0.0,), _np.cumsum(cross)))
+	return 0.5 * _np.abs(cross_sum[loop_end] - cross_sum[loop_start])
+
+
+def uv_means_array(uvs: '_np.ndarray', loop_start: '_np.ndarray', loop_total: '_np.ndarray') -> '_np.ndarray':
+	"""
+	Returns mean UV coords (centers of loops) of all polygons at once as (P, 2) array.
+	Arguments are the same as in `uv_areas_array`.
+	"""
+	# Сумма по каждому полигону через кумулятивную сумму, не зависит от порядка полигонов
+	uv_sum = _np.zeros((len(uvs) + 1, 2), dtype=_np.float64)
+	_np.cumsum(uvs, axis=0, out=uv_sum[1:])
+	return (uv_sum[loop_start + loop_total] - uv_sum[loop_start]) / loop_total[:, None]
+
+
 def repack_active_uv(
 		obj: 'Object', pack_islands_args: 'dict[str, ...]',
 		get_scale: 'Optional[Callable[[Material], float]]' = None, aspect_1: 'bool' = True,
@@ -202,8 +234,30 @@ class Island:
 		self.extends += 1
 	
 	def extend_by_vec2s(self, vec2s: 'Iterable[Vector]'):
+		# Границы копятся в обычных float, Vector трогается только один раз в конце
+		mnx = mny = _math.inf
+		mxx = mxy = -_math.inf
+		count = 0
 		for vec2 in vec2s:
-			self.extend_by_vec2(vec2)
+			x, y = vec2[0], vec2[1]
+			if x < mnx: mnx = x
+			if x > mxx: mxx = x
+			if y < mny: mny = y
+			if y > mxy: mxy = y
+			count += 1
+		if count == 0:
+			return
+		if self.mn is None:
+			self.mn = _mu.Vector((mnx, mny))
+		else:
+			self.mn.x = min(self.mn.x, mnx)
+			self.mn.y = min(self.mn.y, mny)
+		if self.mx is None:
+			self.mx = _mu.Vector((mxx, mxy))
+		else:
+			self.mx.x = max(self.mx.x, mxx)
+			self.mx.y = max(self.mx.y, mxy)
+		self.extends += count
 	
 	def extend_by_bbox(self, other: 'Island'):
 		if self is other:
@@ -232,51 +286,145 @@ class IslandsBuilder:
 	Be careful with `epsilon = 0`, It can result a lots of small islands touching each others but don't intersect.
 	Also very small `epsilon` can result poor performance without good output.
 	`epsilon` about 1..3 of pixel-space recommended (normalize it by you self).
+	
+	Islands are indexed by hierarchical grid, so only nearby Islands are tested on insertion.
+	Each Island is stored on the level where it spans at most 2x2 cells, so large Islands do not degrade lookups.
+	`cell_size` is a size of the finest grid cell in the same space as coords.
+	If not set, `4 * epsilon` of first insertion is used, or size of the first Island if `epsilon` is zero.
 	"""
 	# Занимается разбиением множества точек на прямоугольные непересекающиеся подмноджества
-	__slots__ = ('bboxes', 'merges')
+	__slots__ = ('bboxes', 'merges', 'cell_size', '_index', '_levels')
+	
+	# Во сколько раз клетки каждого следующего уровня сетки больше предыдущего
+	_GRID_LEVEL_FACTOR = 4
 	
-	def __init__(self):
+	def __init__(self, cell_size: 'float' = 0):
 		self.bboxes = list()  # type: List[Island]
 		""" All found non-overlapping `Islands`. """
 		self.merges = 0  # Для диагностических целей
 		""" For diagnostic and debug purposes. Number of Island merges happened. """
+		self.cell_size = cell_size
+		""" Size of the finest grid cell used for spatial lookups. """
+		# id(bbox) -> индекс в self.bboxes
+		self._index = dict()  # type: dict[int, int]
+		# Уровень -> (размер клетки, клетка сетки -> боксы, задевающие клетку)
+		self._levels = dict()  # type: dict[int, tuple[float, dict[tuple[int, int], List[Island]]]]
 	
-	def __str__(self) -> str: return _internals.common_str_slots(self, self.__slots__)
+	def __str__(self) -> str: return _internals.common_str_slots(self, self.__slots__, exclude=('_index', '_levels'))
 	
-	def __repr__(self) -> str: return _internals.common_str_slots(self, self.__slots__)
+	def __repr__(self) -> str:
+		# Короткий: builder попадает в аргументы исключений, а боксов в нём могут быть тысячи
+		return f"{type(self).__name__}(bboxes={len(self.bboxes)}, merges={self.merges}, cell_size={self.cell_size})"
+	
+	def _level_of(self, bbox: 'Island') -> 'int':
+		# Наименьший уровень, клетка которого не меньше бокса: так бокс задевает не больше 2x2 клеток
+		extent = max(bbox.mx.x - bbox.mn.x, bbox.mx.y - bbox.mn.y)
+		level, cell = 0, self.cell_size
+		while cell < extent:
+			level += 1
+			cell *= self._GRID_LEVEL_FACTOR
+		return level
+	
+	@staticmethod
+	def _cells(cell: 'float', mnx: 'float', mny: 'float', mxx: 'float', mxy: 'float') -> 'List[tuple[int, int]]':
+		# Клетки сетки с размером cell, покрывающие прямоугольник
+		x1, y1 = int(mnx // cell), int(mny // cell)
+		x2, y2 = int(mxx // cell), int(mxy // cell)
+		return [(x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)]
+	
+	def _bbox_cells(self, bbox: 'Island') -> 'tuple[dict[tuple[int, int], List[Island]], List[tuple[int, int]]]':
+		level = self._level_of(bbox)
+		grid = self._levels.get(level)
+		if grid is None:
+			grid = self._levels[level] = (self.cell_size * self._GRID_LEVEL_FACTOR ** level, dict())
+		cell, buckets = grid
+		return buckets, self._cells(cell, bbox.mn.x, bbox.mn.y, bbox.mx.x, bbox.mx.y)
+	
+	def _insert(self, bbox: 'Island'):
+		self._index[id(bbox)] = len(self.bboxes)
+		self.bboxes.append(bbox)
+		buckets, cells = self._bbox_cells(bbox)
+		for key in cells:
+			bucket = buckets.get(key)
+			if bucket is None:
+				buckets[key] = [bbox]
+			else:
+				bucket.append(bbox)
+	
+	def _remove(self, bbox: 'Island'):
+		# Удаление из списка заменой на последний, порядок self.bboxes не важен
+		idx = self._index.pop(id(bbox))
+		last = self.bboxes.pop()
+		if last is not bbox:
+			self.bboxes[idx] = last
+			self._index[id(last)] = idx
+		buckets, cells = self._bbox_cells(bbox)
+		for key in cells:
+			bucket = buckets[key]
+			bucket.remove(bbox)
+			if len(bucket) == 0:
+				del buckets[key]
+	
+	def _candidates(self, bbox: 'Island', epsilon: 'float') -> 'Iterable[Island]':
+		# Боксы, которые могут пересекаться с bbox с учетом epsilon: на каждом уровне - из клеток под bbox
+		mnx, mny = bbox.mn.x - epsilon, bbox.mn.y - epsilon
+		mxx, mxy = bbox.mx.x + epsilon, bbox.mx.y + epsilon
+		found = dict()  # type: dict[int, Island]
+		for cell, buckets in self._levels.values():
+			x1, y1 = int(mnx // cell), int(mny // cell)
+			x2, y2 = int(mxx // cell), int(mxy // cell)
+			if (x2 - x1 + 1) * (y2 - y1 + 1) > len(buckets):
+				# На мелких уровнях большой bbox задевает больше клеток, чем занято, проще пройти занятые
+				for (x, y), bucket in buckets.items():
+					if x1 <= x <= x2 and y1 <= y <= y2:
+						for other in bucket:
+							found[id(other)] = other
+			else:
+				for key in self._cells(cell, mnx, mny, mxx, mxy):
+					bucket = buckets.get(key)
+					if bucket is not None:
+						for other in bucket:
+							found[id(other)] = other
+		return found.values()
 	
 	def add_bbox(self, bbox: 'Island', epsilon: 'float' = 0):
 		# Добавляет набор точек
 		if not bbox.is_valid():
 			raise ValueError("Invalid bbox!")
+		if self.cell_size <= 0:
+			# Размер клетки фиксируется при первой вставке, без epsilon - по размеру первого бокса
+			extent = max(bbox.mx.x - bbox.mn.x, bbox.mx.y - bbox.mn.y)
+			self.cell_size = 4 * epsilon if epsilon > 0 else (extent if extent > 0 else 1.0)
 		
 		bbox_to_add = bbox
 		while bbox_to_add is not None:
-			target_idx = -1
+			if id(bbox_to_add) in self._index:
+				raise ValueError("bbox already in bboxes:", (bbox_to_add, self.bboxes))
+			target = None
+			# Те же проверки, что Island.is_inside_bbox и Island.is_intersect, но над float'ами:
+			# координаты вставляемого бокса читаются один раз, без Vector'ов углов на каждого кандидата.
+			mnx, mny = bbox_to_add.mn.x, bbox_to_add.mn.y
+			mxx, mxy = bbox_to_add.mx.x, bbox_to_add.mx.y
 			# Поиск первго бокса с которым пересекается текущий
-			for i in range(len(self.bboxes)):
-				if self.bboxes[i] is bbox_to_add:
-					raise ValueError("bbox already in bboxes:", (bbox_to_add, self.bboxes[i], self.bboxes))
-				# TODO
-				if self.bboxes[i].is_inside_bbox(bbox_to_add, epsilon=epsilon):
+			for other in self._candidates(bbox_to_add, epsilon):
+				omn, omx = other.mn, other.mx
+				omnx, omny, omxx, omxy = omn.x, omn.y, omx.x, omx.y
+				if mxx + epsilon < omxx and mxy + epsilon < omxy and mnx - epsilon > omnx and mny - epsilon > omny:
 					return  # Если вставляемый bbox внутри существующего, то ничего не надо делать
-				if self.bboxes[i].is_intersect(bbox_to_add, epsilon=epsilon):
-					target_idx = i
+				# Какой-то из углов вставляемого бокса внутри расширенного на epsilon существующего
+				lx, hx, ly, hy = omnx - epsilon, omxx + epsilon, omny - epsilon, omxy + epsilon
+				if (lx <= mnx <= hx or lx <= mxx <= hx) and (ly <= mny <= hy or ly <= mxy <= hy):
+					target = other
 					break
-			if target_idx == -1:
+			if target is None:
 				# Пересечение не найдено, добавляем
-				self.bboxes.append(bbox_to_add)
+				self._insert(bbox_to_add)
 				bbox_to_add = None
 			else:
 				# Пересечение найдено - вытаскиваем, соединяем, пытаемся добавить еще раз
-				ejected = self.bboxes[target_idx]
-				del self.bboxes[target_idx]
-				# print("add_bbox: extending: ", (ejected, bbox_to_add))
-				# print("add_bbox: merges: ", self.merges)
-				# print("add_bbox: len(bboxes): ", len(self.bboxes))
-				ejected.extend_by_bbox(bbox_to_add)
-				bbox_to_add = ejected
+				self._remove(target)
+				target.extend_by_bbox(bbox_to_add)
+				bbox_to_add = target
 				self.merges += 1
 	
 	def add_seq(self, vec2s: 'Iterable[Vector]', epsilon: 'float' = 0):
@@ -0,0 +1,150 @@
+# Тесты запускаются Python'ом Blender'а (или с модулями bpy и mathutils из PyPI):
+# python -m pytest tests
+
+import random
+
+import pytest
+
+pytest.importorskip('bpy')
+mathutils = pytest.importorskip('mathutils')
+np = pytest.importorskip('numpy')
+
+from kawa_scripts.atlas_baker import base_baker
+from kawa_scripts.atlas_baker.base_baker import BaseAtlasBaker
+from kawa_scripts.atlas_baker.uv_transform import UVTransform
+
+
+# Минимальные заменители данных Blender: только то, что читают и пишут тестируемые методы BaseAtlasBaker
+
+class _Collection:
+	def __init__(self, **arrays):
+		self.arrays = {k: np.asarray(v) for k, v in arrays.items()}
+	
+	def __len__(self):
+		return len(next(iter(self.arrays.values())))
+	
+	def foreach_get(self, name, buffer):
+		buffer[...] = self.arrays[name].ravel()
+	
+	def foreach_set(self, name, buffer):
+		self.arrays[name] = np.asarray(buffer).reshape(self.arrays[name].shape).copy()
+
+
+class _UVLayer:
+	def __init__(self, name, uvs):
+		self.name = name
+		self.data = _Collection(uv=np.asarray(uvs, dtype=np.float32))
+
+
+class _UVLayers(dict):
+	def __getitem__(self, key):
+		if isinstance(key, int):
+			return list(self.values())[key]
+		return dict.__getitem__(self, key)
+
+
+class _Material:
+	def __init__(self, name):
+		self.name = name
+
+
+class _Slot:
+	def __init__(self, material):
+		self.material = material
+
+
+class _Mesh:
+	def __init__(self, polygons, uvs, materials):
+		# polygons: список (material_index, число loop'ов)
+		totals = [total for _, total in polygons]
+		self.polygons = _Collection(
+			material_index=[index for index, _ in polygons], loop_start=np.cumsum([0] + totals)[:-1], loop_total=totals,
+		)
+		self.loops = _Collection(vertex_index=np.arange(sum(totals)))
+		self.uv_layers = _UVLayers(UVMap=_UVLayer('UVMap', uvs))
+		self.materials = list(materials)
+		self.name = 'Mesh'
+	
+	def update(self):
+		pass
+
+
+class _Object:
+	def __init__(self, mesh):
+		self.data = mesh
+		self.name = 'Object'
+		self.material_slots = [_Slot(material) for material in mesh.materials]
+
+
+class _Baker(BaseAtlasBaker):
+	def get_epsilon(self, obj, mat):
+		return 1
+
+
+def _transform(material, origin, padded, packed):
+	transform = UVTransform()
+	transform.material = material
+	transform.origin_norm = mathutils.Vector(origin)
+	transform.padded_norm = mathutils.Vector(padded)
+	transform.packed_norm = mathutils.Vector(packed)
+	transform.finalize()
+	return transform
+
+
+@pytest.mark.parametrize('duplicate_slot', (False, True))
+def test_apply_baked_materials_mesh_out_of_range_material_index(duplicate_slot):
+	# Индекс материала 5 за пределами слотов: Blender относит такой полигон к последнему слоту.
+	# С дубликатом слота индексы ещё и сводятся к первому слоту материала.
+	mat_a, mat_b, target_a, target_b = _Material('A'), _Material('B'), _Material('TA'), _Material('TB')
+	transform_a = _transform(mat_a, (0, 0, 1, 1), (0, 0, 1, 1), (0, 0, 0.5, 0.5))
+	transform_b = _transform(mat_b, (0, 0, 1, 1), (0, 0, 1, 1), (0.5, 0, 0.5, 0.5))
+	uvs = [(0.1, 0.1), (0.2, 0.1), (0.2, 0.2), (0.1, 0.1), (0.9, 0.1), (0.5, 0.9)]
+	mesh = _Mesh([(0, 3), (5, 3)], uvs, [mat_a, mat_b, mat_b] if duplicate_slot else [mat_a, mat_b])
+	obj = _Object(mesh)
+	baker = _Baker()
+	baker._transforms[mat_a].append(transform_a)
+	baker._transforms[mat_b].append(transform_b)
+	baker._matsizes.update({mat_a: (64, 64), mat_b: (64, 64)})
+	baker._materials.update({(obj, mat_a): target_a, (obj, mat_b): target_b})
+	baker._apply_baked_materials_mesh(obj, mesh)
+	expected = [tuple(transform_a.apply(mathutils.Vector(uv))) for uv in uvs[:3]]
+	expected += [tuple(transform_b.apply(mathutils.Vector(uv))) for uv in uvs[3:]]
+	result = mesh.uv_layers['UVMap'].data.arrays['uv'].reshape(-1, 2)
+	assert np.allclose(result, expected, atol=1e-6)
+	assert mesh.materials[:2] == [target_a, target_b]
+
+
+def _transforms_layout(object_order):
+	# Поиск островов и упаковка для одной и той же сцены, объекты которой добавлены в порядке object_order.
+	# Все острова одной высоты, так что порядок упаковки решает только порядок материалов и островов.
+	materials = {name: _Material(name) for name in ('A', 'B', 'C', 'D')}
+	baker = _Baker()
+	baker.get_island_mode = lambda origin, mat: 'OBJECT'
+	for name in object_order:
+		mat = materials[name[0]]
+		x = 0.1 * int(name[1:])
+		mesh = _Mesh([(0, 4)], [(x, 0.1), (x + 0.05, 0.1), (x + 0.05, 0.3), (x, 0.3)], [mat])
+		obj = _Object(mesh)
+		obj.name = name
+		baker._copies.add(obj)
+		baker._copy_to_source[obj] = obj
+		baker._groups[mat].add(obj)
+		baker._matsizes[mat] = (64, 64)
+	baker._find_islands()
+	baker._create_transforms_from_islands()
+	baker._pack_islands()
+	return [
+		(mat.name, tuple(t.origin_norm), tuple(t.packed_norm))
+		for mat, transforms in baker._transforms.items() for t in transforms
+	]
+
+
+def test_transforms_do_not_depend_on_input_order(monkeypatch):
+	monkeypatch.setattr(base_baker.meshes, 'get_safe', lambda obj, *args, **kwargs: obj.data)
+	names = [f'{mat}{i}' for mat in 'ABCD' for i in range(4)]
+	expected = _transforms_layout(names)
+	assert [name for name, _, _ in expected] == [name[0] for name in names]
+	rng = random.Random(0)
+	for _ in range(5):
+		rng.shuffle(names)
+		assert _transforms_layout(names) == expected
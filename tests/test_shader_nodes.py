@@ -0,0 +1,42 @@
+# Тесты запускаются Python'ом Blender'а (или с модулями bpy и mathutils из PyPI):
+# python -m pytest tests
+
+import pytest
+
+pytest.importorskip('bpy')
+
+from kawa_scripts import shader_nodes
+
+
+class _Socket:
+	# Минимальный заменитель несвязанного входного сокета
+	def __init__(self, node_tree, socket_type, default_value):
+		self.id_data = node_tree
+		self.type = socket_type
+		self.default_value = default_value
+		self.is_output = False
+		self.is_linked = False
+		self.links = ()
+
+
+@pytest.mark.parametrize('from_type, from_value, to_type, to_value, expected', (
+	('COLOR', (0.1, 0.2, 0.3, 0.4), 'COLOR', (1.0, 1.0, 1.0, 1.0), (0.1, 0.2, 0.3, 0.4)),
+	('VALUE', 0.25, 'VALUE', 1.0, 0.25),
+	('VALUE', 0.25, 'COLOR', (1.0, 1.0, 1.0, 1.0), (0.25, 0.25, 0.25, 1.0)),
+))
+def test_socket_copy_input_copies_default_from_source(from_type, from_value, to_type, to_value, expected):
+	node_tree = object()
+	from_socket = _Socket(node_tree, from_type, from_value)
+	to_socket = _Socket(node_tree, to_type, to_value)
+	shader_nodes.socket_copy_input(from_socket, to_socket, copy_default=True)
+	assert to_socket.default_value == expected
+	# Источник не меняется
+	assert from_socket.default_value == from_value
+
+
+def test_socket_copy_input_keeps_default_without_copy_default():
+	node_tree = object()
+	from_socket = _Socket(node_tree, 'VALUE', 0.25)
+	to_socket = _Socket(node_tree, 'VALUE', 1.0)
+	shader_nodes.socket_copy_input(from_socket, to_socket)
+	assert to_socket.default_value == 1.0
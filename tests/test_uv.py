@@ -0,0 +1,40 @@
+# Тесты запускаются Python'ом Blender'а (или с модулями bpy и mathutils из PyPI):
+# python -m pytest tests
+
+import pytest
+
+pytest.importorskip('bpy')
+mathutils = pytest.importorskip('mathutils')
+
+from kawa_scripts import uv
+
+
+def _island(x1, y1, x2, y2):
+	return uv.Island(mathutils.Vector((x1, y1)), mathutils.Vector((x2, y2)))
+
+
+def test_islands_builder_candidates_bounded_for_large_islands():
+	# 50x50 островов по 40px с шагом 50px: все больше 32px, не пересекаются даже с учётом epsilon
+	epsilon = 2
+	builder = uv.IslandsBuilder()
+	for i in range(50):
+		for j in range(50):
+			builder.add_bbox(_island(i * 50, j * 50, i * 50 + 40, j * 50 + 40), epsilon=epsilon)
+	assert len(builder.bboxes) == 2500
+	assert builder.merges == 0
+	# Каждый остров проверяется только против соседей, а не против всех 2500:
+	# острова 40px лежат на уровне с клетками 128px, запрос задевает не больше 2x2 клеток,
+	# а это не больше 6x6 островов с шагом 50px.
+	counts = [len(list(builder._candidates(bbox, epsilon))) for bbox in builder.bboxes]
+	assert max(counts) <= 36
+
+
+def test_islands_builder_merges_across_levels():
+	# Маленький остров рядом с большим попадает на другой уровень сетки, но всё равно сливается
+	builder = uv.IslandsBuilder()
+	builder.add_bbox(_island(0, 0, 1000, 1000), epsilon=1)
+	builder.add_bbox(_island(1000.5, 10, 1010, 20), epsilon=1)
+	assert len(builder.bboxes) == 1
+	assert builder.merges == 1
+	bbox = builder.bboxes[0]
+	assert (bbox.mn.x, bbox.mn.y, bbox.mx.x, bbox.mx.y) == (0, 0, 1010, 1000)